@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-18 04:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0002_follower'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FollowerList',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='follower_list', serialize=False, to='author.author')),
+                ('user_ids', models.BinaryField(default=b'')),
+                ('version', models.PositiveBigIntegerField(default=1)),
+                ('built_version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.auth.models import User
 from django.db import models
 
 
@@ -9,3 +10,33 @@ class Author(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class Follower(models.Model):
+    author = models.ForeignKey(Author, related_name='followers', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='following', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Also the index followers are paged through, ordered by user id, see author.public.
+            models.UniqueConstraint(fields=['author', 'user'], name='unique_author_follower'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} follows {self.author_id}'
+
+
+class FollowerList(models.Model):
+    """
+    The user ids of an author's followers packed as a sorted uint64 array, for reading all
+    of them at once without a row per follower. Follower stays the source of truth: writes
+    only bump `version` and the array is rebuilt by the next reader, see author.public.
+    """
+    author = models.OneToOneField(Author, primary_key=True, related_name='follower_list', on_delete=models.CASCADE)
+    user_ids = models.BinaryField(default=b'')
+    version = models.PositiveBigIntegerField(default=1)
+    built_version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'Followers of {self.author_id}'
@@ -0,0 +1,86 @@
+import sys
+from array import array
+
+from django.contrib.auth.models import User
+from django.db.models import F
+
+from author.models import Follower
+from author.models import FollowerList
+
+# Follower ids are read from the through table this many at a time when rebuilding the packed list.
+REBUILD_CHUNK_SIZE = 10000
+
+
+def _pack(user_ids):
+    if sys.byteorder == 'big':
+        user_ids = array('Q', user_ids)
+        user_ids.byteswap()
+    return user_ids.tobytes()
+
+
+def _unpack(data):
+    user_ids = array('Q')
+    user_ids.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        user_ids.byteswap()
+    return user_ids
+
+
+def follow(author_id, user_id):
+    Follower.objects.get_or_create(author_id=author_id, user_id=user_id)
+
+
+def unfollow(author_id, user_id):
+    Follower.objects.filter(author_id=author_id, user_id=user_id).delete()
+
+
+def mark_followers_changed(author_id):
+    """
+    Makes the next read rebuild the packed follower list. Called by the Follower signals,
+    call it yourself after writes which send none (bulk_create, queryset.update).
+    """
+    FollowerList.objects.filter(author_id=author_id).update(version=F('version') + 1)
+
+
+def get_follower_ids(author_id):
+    """
+    Returns the user ids of an author's followers as a sorted array('Q').
+    Read from the packed FollowerList row, rebuilt first if followers changed since it was packed.
+    """
+    follower_list = FollowerList.objects.filter(author_id=author_id).first()
+    if follower_list is None:
+        follower_list, _ = FollowerList.objects.get_or_create(author_id=author_id)
+    if follower_list.built_version == follower_list.version:
+        return _unpack(follower_list.user_ids)
+
+    version = follower_list.version
+    user_ids = array('Q', (
+        Follower.objects.filter(author_id=author_id).order_by('user_id')
+        .values_list('user_id', flat=True).iterator(chunk_size=REBUILD_CHUNK_SIZE)
+    ))
+    # Skipped if followers changed while we were reading them, the next reader rebuilds again.
+    FollowerList.objects.filter(author_id=author_id, version=version).update(
+        user_ids=_pack(user_ids), built_version=version,
+    )
+    return user_ids
+
+
+def iter_follower_ranges(author_id, batch_size):
+    """
+    Splits the followers of an author into batches of `batch_size`, yielding
+    `(after_user_id, upto_user_id)` bounds: a batch holds the user ids in (after, upto].
+    """
+    user_ids = get_follower_ids(author_id)
+    after = 0
+    for end in range(batch_size, len(user_ids) + batch_size, batch_size):
+        upto = user_ids[min(end, len(user_ids)) - 1]
+        yield after, upto
+        after = upto
+
+
+def get_follower_emails(author_id, after_user_id, upto_user_id):
+    """Returns `(user_id, email)` of the followers of an author in (after, upto], ordered by user id."""
+    return list(
+        User.objects.filter(following__author_id=author_id, id__gt=after_user_id, id__lte=upto_user_id)
+        .order_by('id').values_list('id', 'email')
+    )
@@ -1,8 +1,11 @@
 from django.dispatch import receiver
+from django.db.models.signals import post_delete
 from django.db.models.signals import post_save
 
 from blog import signals
 from author.models import Author
+from author.models import Follower
+from author.public import mark_followers_changed
 
 
 @receiver(signals.notify_author)
@@ -14,3 +17,10 @@ def send_email_to_author(sender, blog_id, **kwargs):
 @receiver(post_save, sender=Author)
 def my_handler(sender, **kwargs):
     print("Signal called")
+
+
+@receiver(post_save, sender=Follower)
+@receiver(post_delete, sender=Follower)
+def follower_changed(sender, instance, **kwargs):
+    # Runs in the writer's transaction, so the packed list can never miss the change.
+    mark_followers_changed(instance.author_id)
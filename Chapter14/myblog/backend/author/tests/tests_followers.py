@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from author import public
+from author.models import Author
+
+
+class FollowerListTest(TestCase):
+    def setUp(self):
+        self.author = Author.objects.create(name='a', email='a@abc.co', bio='')
+        self.users = [User.objects.create_user(f'u{i}', f'u{i}@abc.co') for i in range(5)]
+        for user in reversed(self.users):
+            public.follow(self.author.id, user.id)
+
+    def test_follower_ids_are_packed_and_rebuilt_on_change(self):
+        user_ids = [user.id for user in self.users]
+        self.assertEqual(list(public.get_follower_ids(self.author.id)), user_ids)
+        # Served from the packed row.
+        with self.assertNumQueries(1):
+            self.assertEqual(list(public.get_follower_ids(self.author.id)), user_ids)
+
+        public.unfollow(self.author.id, self.users[1].id)
+        self.assertEqual(list(public.get_follower_ids(self.author.id)), user_ids[:1] + user_ids[2:])
+
+    def test_follower_ranges(self):
+        user_ids = [user.id for user in self.users]
+        self.assertEqual(
+            list(public.iter_follower_ranges(self.author.id, 2)),
+            [(0, user_ids[1]), (user_ids[1], user_ids[3]), (user_ids[3], user_ids[4])],
+        )
@@ -1,9 +1,13 @@
 from django.contrib import admin
-from django.core import paginator
-from django.utils.functional import cached_property
 from django.contrib.admin.models import LogEntry
 
 from blog import models
+from blog.exports import BlogExportAdminMixin
+from blog.search import BlogSearchAdminMixin
+from common.admin_actions import BackgroundActionsAdminMixin
+from common.admin_actions import background_action
+from common.paginator import EstimatedCountAdminMixin
+from common.paginator import EstimatedCountPaginator
 
 
 
@@ -15,7 +19,10 @@ admin.site.register(models.Blog, BlogAdmin)  # Uncomment this line to use BlogAd
 
 
 #############################
-class BlogCustomAdmin(admin.ModelAdmin):
+# Both the filtered count and the full count are estimated on large tables.
+# Searches go through the full text index instead of ILIKE on every title, ranked by relevance.
+# The changelist can be exported as CSV/NDJSON, streamed from a server-side cursor.
+class BlogCustomAdmin(BlogSearchAdminMixin, BlogExportAdminMixin, EstimatedCountAdminMixin, admin.ModelAdmin):
     search_fields = ['title']
     show_full_result_count = True
     list_filter = ['title']
@@ -79,10 +86,9 @@ class LogEntryAdmin(admin.ModelAdmin):
 
 # Idea referred from
 # https://hakibenita.com/optimizing-the-django-admin-paginator
-class CustomPaginator(paginator.Paginator):
-    @cached_property
-    def count(self):
-        return 9999999
+# Uses the Postgres row estimate instead of COUNT(*) on large tables, see common.paginator.
+class CustomPaginator(EstimatedCountPaginator):
+    pass
 
 
 class BlogCustom5Admin(admin.ModelAdmin):
@@ -117,12 +123,13 @@ class BlogCustom7Admin(admin.ModelAdmin):
 
 ###################################
 
-class BlogCustom8Admin(admin.ModelAdmin):
+# The action runs in Celery over chunks of the selection, the request returns right away.
+class BlogCustom8Admin(BackgroundActionsAdminMixin, admin.ModelAdmin):
     actions = ('print_blogs_titles',)
 
-    @admin.action(description='Prints title')
-    def print_blogs_titles(self, request, queryset):
-        for data in queryset.all():
-            print(data.title)
+    @background_action(description='Prints title', chunk_size=2000)
+    def print_blogs_titles(self, queryset):
+        for title in queryset.values_list('title', flat=True):
+            print(title)
 
 # admin.site.register(models.Blog, BlogCustom8Admin) # Uncomment this line to use BlogCustom8Admin
@@ -1,3 +1,6 @@
+from collections import defaultdict
+
+from django.db import connections
 from factory import SubFactory, Sequence
 from factory.django import DjangoModelFactory
 
@@ -5,7 +8,56 @@ from blog import models as blog_models
 from author import models as author_models
 
 
-class AuthorFactory(DjangoModelFactory):
+def bulk_save(instances):
+    """
+    Saves unsaved model instances, and the unsaved instances they reference through foreign
+    keys and one-to-one fields, with one bulk_create per model. References are saved first,
+    level by level, bulk_create then picks up their new primary keys.
+    No signals are sent and save() is not called, like with bulk_create.
+    """
+    by_model = defaultdict(dict)
+    for instance in instances:
+        by_model[type(instance)][id(instance)] = instance
+
+    for model, model_instances in by_model.items():
+        references = defaultdict(dict)
+        for field in model._meta.concrete_fields:
+            if not field.many_to_one and not field.one_to_one:
+                continue
+            for instance in model_instances.values():
+                related = field.get_cached_value(instance, default=None)
+                if related is not None and related._state.adding:
+                    references[id(related)] = related
+        if references:
+            bulk_save(list(references.values()))
+
+        manager = model._default_manager
+        if connections[manager.db].features.can_return_rows_from_bulk_insert:
+            manager.bulk_create(list(model_instances.values()))
+        else:
+            # Without RETURNING the new primary keys are unknown, references would be lost.
+            for instance in model_instances.values():
+                instance.save()
+
+
+class BulkDjangoModelFactory(DjangoModelFactory):
+    """
+    DjangoModelFactory with `bulk_create_batch`, for tests which need many rows: the batch is
+    built in memory (SubFactory included) and saved with bulk_save, a query per model instead
+    of one per row. Sequences advance exactly like with create_batch.
+    """
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def bulk_create_batch(cls, size, **kwargs):
+        instances = cls.build_batch(size, **kwargs)
+        bulk_save(instances)
+        return instances
+
+
+class AuthorFactory(BulkDjangoModelFactory):
     class Meta:
         model = author_models.Author
 
@@ -13,18 +65,18 @@ class AuthorFactory(DjangoModelFactory):
     email = Sequence(lambda n: f'a{n}@gmail.com')
 
 
-class CoverImageFactory(DjangoModelFactory):
+class CoverImageFactory(BulkDjangoModelFactory):
     class Meta:
         model = blog_models.CoverImage
 
     image_link = Sequence(lambda n: f'https://www.example.com/image/{n}')
 
 
-class BlogFactory(DjangoModelFactory):
+class BlogFactory(BulkDjangoModelFactory):
     class Meta:
         model = blog_models.Blog
 
     title = Sequence(lambda n: f'Blog {n}')
     content = Sequence(lambda n: f'Blog content {n}')
     author = SubFactory(AuthorFactory)
-    cover_image = SubFactory(CoverImageFactory)
\ No newline at end of file
+    cover_image = SubFactory(CoverImageFactory)
@@ -0,0 +1,179 @@
+"""
+Row generators of the seed_blogs command. Plain Python without Django imports so worker
+processes can run them whatever the multiprocessing start method is. Every job seeds its own
+random generator from the plan seed and its range, the output does not depend on the number
+of workers or the order jobs run in.
+"""
+import datetime
+import random
+from bisect import bisect
+from collections import namedtuple
+from functools import lru_cache
+from itertools import accumulate
+
+# Zipf exponent of authors' productivity and popularity, and of tag usage.
+ZIPF_EXPONENT = 1.1
+# Tags are grouped into topics of this size, the tags of a blog mostly come from one topic.
+TOPIC_SIZE = 20
+TOPIC_TAG_PROBABILITY = 0.8
+TAGS_PER_BLOG = (1, 2, 2, 3, 3, 3, 4, 5)
+# Authors followed by every generated user.
+FOLLOWS_PER_USER = 10
+VOCABULARY_SIZE = 20000
+
+# Generated fields per model, in the order of the row tuples.
+FIELDS = {
+    'author.Author': ('id', 'name', 'email', 'bio'),
+    'auth.User': ('id', 'password', 'is_superuser', 'username', 'first_name', 'last_name', 'email',
+                  'is_staff', 'is_active', 'date_joined'),
+    'blog.Tag': ('id', 'created_at', 'updated_at', 'name'),
+    'blog.CoverImage': ('id', 'created_at', 'updated_at', 'image_link'),
+    'blog.Blog': ('id', 'title', 'content', 'author_id', 'created_at', 'updated_at', 'cover_image_id'),
+    'blog.Blog_tags': ('blog_id', 'tag_id'),
+    'author.Follower': ('author_id', 'user_id', 'created_at'),
+}
+
+# Sizes of the data set and the first primary key of every model, ids are assigned up front
+# so workers can reference rows generated by other workers.
+SeedPlan = namedtuple('SeedPlan', [
+    'seed', 'authors', 'blogs', 'tags', 'users', 'followers', 'first_ids', 'start', 'days', 'content_words', 'as_copy',
+])
+
+
+@lru_cache(maxsize=None)
+def _zipf_weights(size):
+    return list(accumulate(1 / rank ** ZIPF_EXPONENT for rank in range(1, size + 1)))
+
+
+def _zipf(rng, size):
+    """Index in [0, size), 0 being the most likely."""
+    weights = _zipf_weights(size)
+    return min(bisect(weights, rng.random() * weights[-1]), size - 1)
+
+
+@lru_cache(maxsize=None)
+def _vocabulary(seed):
+    rng = random.Random(f'{seed}:vocabulary')
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choices(letters, k=rng.randint(2, 10))) for _ in range(VOCABULARY_SIZE)]
+
+
+def _words(rng, plan, count):
+    vocabulary = _vocabulary(plan.seed)
+    # Word frequencies of natural text are Zipfian as well.
+    return ' '.join(rng.choices(vocabulary, cum_weights=_zipf_weights(len(vocabulary)), k=count))
+
+
+def _moment(plan, position, total):
+    # Spread over the last `days` days, growing with the primary key like real inserts.
+    return plan.start + datetime.timedelta(days=plan.days * position / max(total, 1))
+
+
+def _authors(plan, rng, start, stop):
+    first = plan.first_ids['author.Author']
+    for i in range(start, stop):
+        yield first + i, f'Seed author {first + i}', f'seed.author.{first + i}@example.com', _words(rng, plan, 12)
+
+
+def _users(plan, rng, start, stop):
+    first = plan.first_ids['auth.User']
+    for i in range(start, stop):
+        user_id = first + i
+        yield (user_id, '!', False, f'seed_user_{user_id}', '', '', f'seed.user.{user_id}@example.com',
+               False, True, _moment(plan, i, plan.users))
+
+
+def _tags(plan, rng, start, stop):
+    first = plan.first_ids['blog.Tag']
+    for i in range(start, stop):
+        created_at = _moment(plan, i, plan.tags)
+        yield first + i, created_at, created_at, f'{_words(rng, plan, 1)}-{first + i}'
+
+
+def _blog_tags(plan, rng):
+    topics = (plan.tags + TOPIC_SIZE - 1) // TOPIC_SIZE
+    topic = _zipf(rng, topics)
+    topic_size = min(TOPIC_SIZE, plan.tags - topic * TOPIC_SIZE)
+    tags = set()
+    for _ in range(min(rng.choice(TAGS_PER_BLOG), plan.tags)):
+        if rng.random() < TOPIC_TAG_PROBABILITY:
+            tags.add(topic * TOPIC_SIZE + _zipf(rng, topic_size))
+        else:
+            tags.add(_zipf(rng, plan.tags))
+    return sorted(tags)
+
+
+def _blogs(plan, rng, start, stop):
+    first_blog, first_cover = plan.first_ids['blog.Blog'], plan.first_ids['blog.CoverImage']
+    first_author, first_tag = plan.first_ids['author.Author'], plan.first_ids['blog.Tag']
+    cover_images, blogs, blog_tags = [], [], []
+    for i in range(start, stop):
+        blog_id, cover_id = first_blog + i, first_cover + i
+        created_at = _moment(plan, i, plan.blogs)
+        updated_at = created_at + datetime.timedelta(hours=rng.random() * 48) if rng.random() < 0.2 else created_at
+        cover_images.append((cover_id, created_at, created_at, f'https://www.example.com/seed/{cover_id}.png'))
+        title = f'{_words(rng, plan, rng.randint(2, 8)).capitalize()} {blog_id}'[-100:]
+        # Lengths vary a lot between blogs, around `content_words` on average.
+        content = _words(rng, plan, max(1, int(rng.expovariate(1 / plan.content_words))))
+        blogs.append((blog_id, title, content, first_author + _zipf(rng, plan.authors), created_at, updated_at, cover_id))
+        if plan.tags:
+            blog_tags.extend((blog_id, first_tag + tag) for tag in _blog_tags(plan, rng))
+    # Cover images first, blogs reference them.
+    return [('blog.CoverImage', cover_images), ('blog.Blog', blogs), ('blog.Blog_tags', blog_tags)]
+
+
+def _followers(plan, rng, start, stop):
+    first_author, first_user = plan.first_ids['author.Author'], plan.first_ids['auth.User']
+    follows = min(FOLLOWS_PER_USER, plan.authors)
+    for i in range(start, stop):
+        count = min(follows, plan.followers - i * follows)
+        # Popular authors collect most of the followers.
+        authors = set()
+        while len(authors) < count:
+            authors.add(_zipf(rng, plan.authors))
+        created_at = _moment(plan, i, plan.users)
+        for author in sorted(authors):
+            yield first_author + author, first_user + i, created_at
+
+
+_SINGLE_MODEL_JOBS = {
+    'author.Author': _authors,
+    'auth.User': _users,
+    'blog.Tag': _tags,
+    'author.Follower': _followers,
+}
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if value is True or value is False:
+        return 't' if value else 'f'
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    value = str(value)
+    if any(char in value for char in '\\\t\n\r'):
+        value = value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return value
+
+
+def to_copy_data(rows):
+    """Rows in the text format of Postgres' COPY."""
+    return ''.join('\t'.join(_copy_value(value) for value in row) + '\n' for row in rows).encode()
+
+
+def generate(job):
+    """
+    Generates the rows of one job `(plan, kind, start, stop)`, where kind is a model label or
+    'blogs' (blogs with their cover images and tags). Returns `[(model label, rows)]`, the rows
+    already encoded for COPY when `plan.as_copy` is set.
+    """
+    plan, kind, start, stop = job
+    rng = random.Random(f'{plan.seed}:{kind}:{start}')
+    if kind == 'blogs':
+        output = _blogs(plan, rng, start, stop)
+    else:
+        output = [(kind, list(_SINGLE_MODEL_JOBS[kind](plan, rng, start, stop)))]
+    if plan.as_copy:
+        output = [(label, to_copy_data(rows)) for label, rows in output]
+    return output
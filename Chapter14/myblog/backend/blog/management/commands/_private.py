@@ -0,0 +1,41 @@
+from author.models import Author
+from blog.models import Blog
+from blog.models import CoverImage
+from blog.models import Tag
+
+
+def create_dummy_blogs(count, prefix='dummy', tags_per_blog=3, batch_size=5000, title=None):
+    """
+    Inserts `count` blogs with their authors, cover images and tags using bulk_create.
+    Titles start with `prefix` so callers can select the rows they created.
+    :param title: optional callable returning the title of the i-th blog instead, must be unique.
+    """
+    authors = Author.objects.bulk_create(
+        [Author(name=f'{prefix} author {i}', email=f'{prefix}.{i}@example.com', bio='') for i in range(max(1, count // 100))]
+    )
+    tags = Tag.objects.bulk_create([Tag(name=f'{prefix} tag {i}') for i in range(20)])
+    cover_images = CoverImage.objects.bulk_create(
+        [CoverImage(image_link=f'https://www.example.com/{prefix}/{i}') for i in range(count)], batch_size=batch_size
+    )
+    blogs = Blog.objects.bulk_create(
+        [
+            Blog(
+                title=title(i) if title else f'{prefix} blog {i}',
+                content=f'{prefix} blog content {i}',
+                author=authors[i % len(authors)],
+                cover_image=cover_images[i],
+            )
+            for i in range(count)
+        ],
+        batch_size=batch_size,
+    )
+    blog_tag = Blog.tags.through
+    blog_tag.objects.bulk_create(
+        [
+            blog_tag(blog_id=blog.id, tag_id=tags[(i + j) % len(tags)].id)
+            for i, blog in enumerate(blogs)
+            for j in range(tags_per_blog)
+        ],
+        batch_size=batch_size,
+    )
+    return blogs
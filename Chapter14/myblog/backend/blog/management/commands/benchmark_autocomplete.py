@@ -0,0 +1,55 @@
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db import transaction
+
+from blog.management.commands._private import create_dummy_blogs
+from blog.search import suggest_titles
+from common.metrics import Histogram
+
+
+def random_word(rng):
+    return ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+
+
+class Command(BaseCommand):
+    help = 'Times title autocomplete queries against generated titles, the data is rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = [random_word(rng) for _ in range(5000)]
+
+        def title(i):
+            return f'{" ".join(rng.choices(vocabulary, k=3))} {i}'[:100]
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            create_dummy_blogs(options['rows'], prefix='autocomplete', tags_per_blog=0, title=title)
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE blog_blog')
+            self.stdout.write(f'Inserted {options["rows"]} blogs in {time.perf_counter() - started:.1f}s')
+
+            prefixes = [rng.choice(vocabulary)[:rng.randint(3, 6)] for _ in range(options['queries'])]
+            if connection.vendor == 'postgresql':
+                self.stdout.write(suggest_titles(prefixes[0]).explain(analyze=True))
+
+            latencies = Histogram()
+            for prefix in prefixes:
+                started = time.perf_counter()
+                list(suggest_titles(prefix))
+                latencies.record((time.perf_counter() - started) * 1e6)
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{options["queries"]} queries: p50 {latencies.percentile(50) / 1000:.2f}ms, '
+            f'p99 {latencies.percentile(99) / 1000:.2f}ms, max {latencies.max / 1000:.2f}ms'
+        ))
@@ -0,0 +1,46 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from blog.management.commands._private import create_dummy_blogs
+from blog.models import Blog
+from blog.serializers import BlogSerializer
+from common.fast_serializers import compile_serializer
+
+
+class Command(BaseCommand):
+    help = 'Compares BlogSerializer with its compiled read-only fast path, the data is rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', nargs='+', type=int, default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        compiled = compile_serializer(BlogSerializer)
+        for rows in options['rows']:
+            with transaction.atomic():
+                prefix = f'benchmark {rows}'
+                create_dummy_blogs(rows, prefix=prefix)
+                queryset = Blog.objects.filter(title__startswith=f'{prefix} ').order_by('id')
+
+                # Give DRF its best case, the tags are prefetched instead of queried per blog.
+                drf_queryset = queryset.prefetch_related('tags')
+                expected = JSONRenderer().render(BlogSerializer(drf_queryset, many=True).data)
+                actual = JSONRenderer().render(compiled.serialize(queryset))
+                if expected != actual:
+                    raise AssertionError('Compiled serializer output differs from BlogSerializer')
+
+                drf_time = min(timeit.repeat(
+                    lambda: BlogSerializer(drf_queryset, many=True).data, number=1, repeat=options['repeat']
+                ))
+                compiled_time = min(timeit.repeat(
+                    lambda: compiled.serialize(queryset), number=1, repeat=options['repeat']
+                ))
+                transaction.set_rollback(True)
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{rows} rows: BlogSerializer {drf_time * 1000:.1f}ms, '
+                f'compiled {compiled_time * 1000:.1f}ms ({drf_time / compiled_time:.1f}x faster)'
+            ))
@@ -0,0 +1,158 @@
+import datetime
+import io
+import multiprocessing
+import os
+import time
+from collections import Counter
+from collections import deque
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from blog.management.commands._generators import FIELDS
+from blog.management.commands._generators import FOLLOWS_PER_USER
+from blog.management.commands._generators import SeedPlan
+from blog.management.commands._generators import generate
+
+# Models with ids assigned by the generators, the others get theirs from the database.
+ID_MODELS = ('author.Author', 'auth.User', 'blog.Tag', 'blog.CoverImage', 'blog.Blog')
+# Rows per INSERT when bulk_create is used instead of COPY.
+BULK_CREATE_BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates a large synthetic data set: Zipf distributed blogs per author and followers per author, '
+        'tags used together by topic. Rows are generated by worker processes and loaded with COPY on Postgres, '
+        'bulk_create elsewhere, in one transaction. Existing rows are left alone.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--blogs', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=500)
+        parser.add_argument('--followers', type=int, default=100000,
+                            help=f'Follower rows, every generated user follows {FOLLOWS_PER_USER} authors')
+        parser.add_argument('--days', type=int, default=730, help='Blogs are created over this many past days')
+        parser.add_argument('--content-words', type=int, default=200, help='Average words of content per blog')
+        parser.add_argument('--chunk-size', type=int, default=20000, help='Rows generated per job')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options['authors'] < 1 or min(options['blogs'], options['tags'], options['followers']) < 0:
+            raise CommandError('At least one author is needed and counts can not be negative.')
+        database = options['database']
+        connection = connections[database]
+        use_copy = connection.vendor == 'postgresql'
+
+        follows = min(FOLLOWS_PER_USER, options['authors'])
+        plan = SeedPlan(
+            seed=options['seed'],
+            authors=options['authors'],
+            blogs=options['blogs'],
+            tags=options['tags'],
+            users=(options['followers'] + follows - 1) // follows,
+            followers=options['followers'],
+            first_ids=self.first_ids(database),
+            start=timezone.now() - datetime.timedelta(days=options['days']),
+            days=options['days'],
+            content_words=options['content_words'],
+            as_copy=use_copy,
+        )
+        jobs = self.jobs(plan, options['chunk_size'])
+
+        started = time.perf_counter()
+        counts = Counter()
+        workers = max(1, options['workers'])
+        # Created before the transaction is opened, the workers never touch the database.
+        pool = multiprocessing.Pool(workers) if workers > 1 else None
+        try:
+            with transaction.atomic(using=database):
+                if use_copy:
+                    with connection.cursor() as cursor:
+                        # Foreign keys are deferred by default, which would queue one check per row until COMMIT.
+                        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+                for output in self.generate(pool, jobs, workers):
+                    for label, rows in output:
+                        counts[label] += self.load_copy(connection, label, rows) if use_copy \
+                            else self.load_bulk_create(database, label, rows)
+                if use_copy:
+                    self.reset_sequences(connection)
+        finally:
+            if pool is not None:
+                pool.terminate()
+        if use_copy:
+            # Fresh statistics, the point of the data set is realistic query plans.
+            with connection.cursor() as cursor:
+                for label in FIELDS:
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(apps.get_model(label)._meta.db_table)}')
+
+        elapsed = time.perf_counter() - started
+        for label in FIELDS:
+            self.stdout.write(f'{label}: {counts[label]} rows')
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {sum(counts.values())} rows in {elapsed:.1f}s with {"COPY" if use_copy else "bulk_create"}'
+        ))
+
+    def first_ids(self, database):
+        return {
+            label: (apps.get_model(label).objects.using(database).aggregate(last=Max('pk'))['last'] or 0) + 1
+            for label in ID_MODELS
+        }
+
+    def jobs(self, plan, chunk_size):
+        # In load order, rows only reference rows of earlier jobs.
+        totals = [('author.Author', plan.authors), ('auth.User', plan.users), ('blog.Tag', plan.tags),
+                  ('blogs', plan.blogs), ('author.Follower', plan.users)]
+        return [
+            (plan, kind, start, min(start + chunk_size, total))
+            for kind, total in totals
+            for start in range(0, total, chunk_size)
+        ]
+
+    def generate(self, pool, jobs, workers):
+        """Yields the output of the jobs in order, with at most two jobs per worker waiting to be loaded."""
+        if pool is None:
+            yield from map(generate, jobs)
+            return
+        pending = deque()
+        for job in jobs:
+            pending.append(pool.apply_async(generate, (job,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+    def load_copy(self, connection, label, data):
+        if not data:
+            return 0
+        model = apps.get_model(label)
+        quote_name = connection.ops.quote_name
+        columns = ', '.join(quote_name(model._meta.get_field(name).column) for name in FIELDS[label])
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY {quote_name(model._meta.db_table)} ({columns}) FROM STDIN', io.BytesIO(data))
+        return data.count(b'\n')
+
+    def load_bulk_create(self, database, label, rows):
+        model = apps.get_model(label)
+        fields = FIELDS[label]
+        model.objects.using(database).bulk_create(
+            [model(**dict(zip(fields, row))) for row in rows], batch_size=BULK_CREATE_BATCH_SIZE,
+        )
+        return len(rows)
+
+    def reset_sequences(self, connection):
+        # Ids were given explicitly, move the sequences past them.
+        statements = connection.ops.sequence_reset_sql(no_style(), [apps.get_model(label) for label in ID_MODELS])
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
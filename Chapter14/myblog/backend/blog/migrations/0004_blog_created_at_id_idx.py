@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0001_initial'),
+        ('blog', '0003_alter_blog_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['created_at', 'id'], name='blog_created_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0 on 2026-10-18 04:51
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+from common.migration_operations import AddIndexIfPostgres
+from common.migration_operations import RunSQLIfPostgres
+
+# Keeps search_vector in sync with title and content on every insert and update, including
+# bulk_create and queryset updates which skip Model.save().
+SEARCH_VECTOR_TRIGGER = '''
+CREATE FUNCTION blog_blog_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.content, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER blog_blog_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, content, search_vector ON blog_blog
+FOR EACH ROW EXECUTE FUNCTION blog_blog_search_vector_update();
+
+-- Backfills existing rows, the trigger computes the value.
+UPDATE blog_blog SET search_vector = NULL;
+'''
+
+DROP_SEARCH_VECTOR_TRIGGER = '''
+DROP TRIGGER IF EXISTS blog_blog_search_vector_trigger ON blog_blog;
+DROP FUNCTION IF EXISTS blog_blog_search_vector_update();
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_blog_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        RunSQLIfPostgres(SEARCH_VECTOR_TRIGGER, DROP_SEARCH_VECTOR_TRIGGER),
+        AddIndexIfPostgres(
+            model_name='blog',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='blog_search_vector_idx'),
+        ),
+    ]
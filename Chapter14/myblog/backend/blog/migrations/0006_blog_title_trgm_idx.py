@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-18 04:53
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+from common.migration_operations import AddIndexIfPostgres
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_blog_search_vector'),
+    ]
+
+    operations = [
+        # Skipped on other databases by Django itself.
+        TrigramExtension(),
+        AddIndexIfPostgres(
+            model_name='blog',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='blog_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
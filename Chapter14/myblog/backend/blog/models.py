@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 
 class Blog(models.Model):
@@ -10,6 +12,9 @@ class Blog(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     cover_image = models.OneToOneField('CoverImage', related_name='blog_cover_image', on_delete=models.CASCADE)
     tags = models.ManyToManyField('Tag', related_name='blog_tags')
+    # Title (weight A) and content (weight B), kept current by a database trigger so bulk
+    # inserts and queryset updates are covered too. Only maintained on Postgres, see blog.search.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return self.title
@@ -19,6 +24,13 @@ class Blog(models.Model):
             ("update_title", "Can update the title of the blog"),
             ("update_content", "Can update the content of blog"),
         ]
+        indexes = [
+            # Used by keyset pagination, see blog.pagination.
+            models.Index(fields=['created_at', 'id'], name='blog_created_at_id_idx'),
+            GinIndex(fields=['search_vector'], name='blog_search_vector_idx'),
+            # Serves title__trigram_istartswith, see blog.views.autocomplete_blog_titles.
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='blog_title_trgm_idx'),
+        ]
 
 
 class BaseTimeStampModel(models.Model):
@@ -0,0 +1,88 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+# Newest blogs first, `id` breaks ties between blogs created in the same instant.
+# Backed by the (created_at, id) index on Blog.
+KEYSET_ORDERING = ('-created_at', '-id')
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(created_at, pk, direction):
+    """
+    Builds an opaque cursor pointing at the blog with the given (created_at, id) position.
+    :param direction: "next" to fetch older blogs than the position, "prev" to fetch newer ones.
+    """
+    payload = {'c': created_at.isoformat(), 'i': pk, 'd': direction}
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns (created_at, id, direction) for a cursor, raises InvalidCursor if it was tampered with."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        created_at = parse_datetime(payload['c'])
+        pk = int(payload['i'])
+        direction = payload['d']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if created_at is None or direction not in ('next', 'prev'):
+        raise InvalidCursor(cursor)
+    return created_at, pk, direction
+
+
+def _position(row):
+    # Rows are either model instances or `.values()` dicts.
+    if isinstance(row, dict):
+        return row['created_at'], row['id']
+    return row.created_at, row.id
+
+
+def paginate_by_keyset(queryset, cursor=None, page_size=10):
+    """
+    Returns one page of `queryset` along with the cursors of its neighbouring pages.
+    `queryset` may be a `.values()` queryset as long as it selects `created_at` and `id`.
+
+    Unlike OFFSET pagination the database only ever reads `page_size + 1` rows from the
+    (created_at, id) index, so the cost of a page does not grow with its depth.
+    :return: tuple of (list of rows, next cursor or None, previous cursor or None)
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    position = decode_cursor(cursor) if cursor else None
+    backwards = position is not None and position[2] == 'prev'
+
+    if position is not None:
+        created_at, pk, _ = position
+        # `created_at <= x AND (created_at < x OR id < y)` instead of a plain OR keeps the
+        # leading condition sargable, so Postgres can start a range scan on the index.
+        if backwards:
+            queryset = queryset.filter(Q(created_at__gte=created_at), Q(created_at__gt=created_at) | Q(id__gt=pk))
+        else:
+            queryset = queryset.filter(Q(created_at__lte=created_at), Q(created_at__lt=created_at) | Q(id__lt=pk))
+
+    ordering = ('created_at', 'id') if backwards else KEYSET_ORDERING
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        # Coming back from an older page means there is always a next page to return to,
+        # and the same holds for the previous page when moving forward from a cursor.
+        if has_more or backwards:
+            next_cursor = encode_cursor(*_position(rows[-1]), 'next')
+        if (has_more and backwards) or (position is not None and not backwards):
+            prev_cursor = encode_cursor(*_position(rows[0]), 'prev')
+    return rows, next_cursor, prev_cursor
@@ -1,13 +1,126 @@
+import datetime
+from collections import Counter
+
+import redis
+from django.db import transaction
 from django.utils import timezone
 
 from blog import signals
 from blog.models import Blog
+from blog.models import CoverImage
+from common.caching import bump_cache_version
+from common.redis_util import get_redis_connection
+
+# Cache namespace of blog.views.get_all_blogs, versioned per author.
+BLOGS_BY_AUTHOR_CACHE = 'blogs-by-author'
+
+DAILY_BLOG_LIMIT = 10
+
+# Rows per INSERT statement of bulk_create_blogs.
+BULK_CREATE_BATCH_SIZE = 1000
+
+# Only counts on top of a loaded counter, a missing one is rebuilt from the database on read.
+_INCR_IF_EXISTS = '''
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return false
+'''
+
 
 def publish_blog(blog_id):
     # publish blog logic to notify author
     signals.notify_author.send(sender=None, blog_id=blog_id)
 
+
+def _utc_day(moment):
+    start = moment.astimezone(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + datetime.timedelta(days=1)
+
+
+def _daily_count_key(author_id, day_start):
+    return f'blogs-created:{author_id}:{day_start.date().isoformat()}'
+
+
+def count_blogs_created_on(author_id, moment):
+    # A range on created_at rather than created_at__date, which casts the column and can't use its index.
+    day_start, day_end = _utc_day(moment)
+    return Blog.objects.filter(author_id=author_id, created_at__gte=day_start, created_at__lt=day_end).count()
+
+
+def get_blogs_created_today(author_id):
+    """
+    Number of blogs the author created in the current UTC day, read from a Redis counter.
+    A cold counter is loaded from the database and expires at the end of the day.
+    """
+    now = timezone.now()
+    day_start, day_end = _utc_day(now)
+    key = _daily_count_key(author_id, day_start)
+    try:
+        connection = get_redis_connection()
+        count = connection.get(key)
+        if count is not None:
+            return int(count)
+        count = count_blogs_created_on(author_id, now)
+        # Relative to timezone.now() so frozen clocks in tests get a sensible expiry as well.
+        connection.set(key, count, nx=True, ex=int((day_end - now).total_seconds()) + 1)
+        return int(connection.get(key) or count)
+    except redis.RedisError:
+        return count_blogs_created_on(author_id, now)
+
+
+def record_blogs_created(author_id, count=1, created_at=None):
+    """
+    Adds blogs to the author's counter for the day they were created on, negative counts
+    remove deleted ones. Call it once the blogs are committed, bulk inserts included.
+    """
+    day_start, _ = _utc_day(created_at or timezone.now())
+    try:
+        get_redis_connection().eval(_INCR_IF_EXISTS, 1, _daily_count_key(author_id, day_start), count)
+    except redis.RedisError:
+        # The counter might now be off, drop it so the next read reloads it.
+        try:
+            get_redis_connection().delete(_daily_count_key(author_id, day_start))
+        except redis.RedisError:
+            pass
+
+
 def check_if_allowed_to_publish_blog(author):
     # check if author is allowed to publish blog
-    blog_count_for_today = Blog.objects.filter(author_id=author.id, created_at__date=timezone.now().date()).count()
-    return blog_count_for_today < 10
+    return get_blogs_created_today(author.id) < DAILY_BLOG_LIMIT
+
+
+def invalidate_author_blogs(author_ids):
+    # Drops the cached blog lists of the given authors.
+    for author_id in author_ids:
+        bump_cache_version(BLOGS_BY_AUTHOR_CACHE, author_id)
+
+
+def bulk_create_blogs(items):
+    """
+    Creates blogs, their cover images and tags with a few multi-row INSERTs in one transaction.
+    bulk_create sends no signals, the author caches and daily counters are updated here instead.
+    :param items: dicts with title, content, author (id), cover_image_link and tags (ids), already validated
+    """
+    with transaction.atomic():
+        cover_images = CoverImage.objects.bulk_create(
+            [CoverImage(image_link=item['cover_image_link']) for item in items], batch_size=BULK_CREATE_BATCH_SIZE,
+        )
+        blogs = Blog.objects.bulk_create([
+            Blog(title=item['title'], content=item['content'], author_id=item['author'], cover_image=cover_image)
+            for item, cover_image in zip(items, cover_images)
+        ], batch_size=BULK_CREATE_BATCH_SIZE)
+        BlogTag = Blog.tags.through
+        BlogTag.objects.bulk_create([
+            BlogTag(blog_id=blog.pk, tag_id=tag_id)
+            for blog, item in zip(blogs, items) for tag_id in dict.fromkeys(item['tags'])
+        ], batch_size=BULK_CREATE_BATCH_SIZE)
+
+        created = Counter((blog.author_id, _utc_day(blog.created_at)[0]) for blog in blogs)
+
+        def update_author_caches():
+            invalidate_author_blogs({author_id for author_id, _ in created})
+            for (author_id, day), count in created.items():
+                record_blogs_created(author_id, count, created_at=day)
+        transaction.on_commit(update_author_caches)
+    return blogs
@@ -0,0 +1,56 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from blog.models import Blog
+from blog.public import invalidate_author_blogs
+from blog.public import record_blogs_created
+
+
+@receiver(pre_save, sender=Blog)
+def remember_previous_author(sender, instance, update_fields=None, **kwargs):
+    # When a blog moves to another author both authors' lists are stale.
+    if instance.pk and (update_fields is None or 'author' in update_fields):
+        instance._previous_author_id = Blog.objects.filter(pk=instance.pk).values_list('author_id', flat=True).first()
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def invalidate_blogs_on_change(sender, instance, **kwargs):
+    author_ids = {instance.author_id, getattr(instance, '_previous_author_id', None)} - {None}
+    # Readers must not cache the old rows again between the invalidation and the commit.
+    transaction.on_commit(lambda: invalidate_author_blogs(author_ids))
+
+
+@receiver(post_save, sender=Blog)
+def count_created_blog(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: record_blogs_created(instance.author_id, created_at=instance.created_at))
+
+
+@receiver(post_delete, sender=Blog)
+def count_deleted_blog(sender, instance, **kwargs):
+    transaction.on_commit(lambda: record_blogs_created(instance.author_id, -1, created_at=instance.created_at))
+
+
+@receiver(m2m_changed, sender=Blog.tags.through)
+def invalidate_blogs_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        author_ids = {instance.author_id}
+    else:
+        # `instance` is a Tag and `pk_set` holds blog ids.
+        if action == 'pre_clear':
+            instance._blog_author_ids = set(Blog.objects.filter(tags=instance).values_list('author_id', flat=True))
+            return
+        if action == 'post_clear':
+            author_ids = getattr(instance, '_blog_author_ids', set())
+        elif action in ('post_add', 'post_remove'):
+            author_ids = set(Blog.objects.filter(pk__in=pk_set).values_list('author_id', flat=True))
+        else:
+            return
+    transaction.on_commit(lambda: invalidate_author_blogs(author_ids))
@@ -0,0 +1,30 @@
+from rest_framework import renderers
+
+from blog.exports import iter_csv
+from blog.exports import iter_ndjson
+
+
+# Export views stream their rows themselves, these renderers let DRF's content negotiation
+# accept `?format=ndjson`/`?format=csv` and render small (e.g. error) payloads in the same format.
+class NDJSONRenderer(renderers.BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(iter_ndjson(rows)).encode(self.charset)
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not data:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(iter_csv(rows, list(rows[0]))).encode(self.charset)
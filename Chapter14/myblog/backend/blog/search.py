@@ -0,0 +1,65 @@
+from functools import lru_cache
+
+from django.contrib.admin.views.main import ORDER_VAR
+from django.contrib.postgres.search import SearchQuery
+from django.contrib.postgres.search import SearchRank
+from django.db import connections
+from django.db.models import Case
+from django.db.models import F
+from django.db.models import FloatField
+from django.db.models import Q
+from django.db.models import Value
+from django.db.models import When
+
+from blog.models import Blog
+
+SEARCH_CONFIG = 'english'
+MAX_SEARCH_RESULTS = 50
+AUTOCOMPLETE_LIMIT = 10
+
+
+def search_blogs(search_term, queryset=None):
+    """
+    Filters blogs matching `search_term` and annotates them with `search_rank`, title matches
+    ranking above content matches. On Postgres this is a full text search over the GIN indexed
+    search_vector, elsewhere (sqlite in tests) a plain case insensitive substring match.
+    """
+    if queryset is None:
+        queryset = Blog.objects.all()
+    if connections[queryset.db].vendor == 'postgresql':
+        query = SearchQuery(search_term, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(search_rank=SearchRank(F('search_vector'), query))
+    return queryset.filter(Q(title__icontains=search_term) | Q(content__icontains=search_term)).annotate(
+        search_rank=Case(When(title__icontains=search_term, then=Value(1.0)), default=Value(0.5), output_field=FloatField()),
+    )
+
+
+def suggest_titles(prefix, limit=AUTOCOMPLETE_LIMIT):
+    """`(id, title)` of the blogs whose title starts with `prefix`, served by the trigram index on Postgres."""
+    return Blog.objects.filter(title__trigram_istartswith=prefix).order_by('title').values_list('id', 'title')[:limit]
+
+
+class _RankedSearchChangeListMixin:
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        # Best matches first, unless a column was clicked to sort by.
+        if self.query and ORDER_VAR not in self.params:
+            queryset = queryset.order_by('-search_rank', '-pk')
+        return queryset
+
+
+@lru_cache(maxsize=None)
+def _ranked_changelist(changelist_class):
+    return type(f'Ranked{changelist_class.__name__}', (_RankedSearchChangeListMixin, changelist_class), {})
+
+
+class BlogSearchAdminMixin:
+    """Searches the blog changelist with search_blogs and orders the results by rank."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return search_blogs(search_term, queryset), False
+
+    def get_changelist(self, request, **kwargs):
+        return _ranked_changelist(super().get_changelist(request, **kwargs))
@@ -1,9 +1,90 @@
 from rest_framework import serializers
 
+from author.models import Author
 from blog import models
+from blog.public import bulk_create_blogs
+from common.eager_loading import EagerLoadingListSerializer
+
+# Most blogs accepted by one request to the bulk endpoint.
+MAX_BULK_BLOGS = 5000
 
 
 class BlogSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Blog
-        fields = '__all__'
+        # The search vector is an internal index column.
+        exclude = ['search_vector']
+        # BlogSerializer(queryset, many=True) prefetches the tags instead of querying them per blog.
+        list_serializer_class = EagerLoadingListSerializer
+
+
+class BulkBlogListSerializer(serializers.ListSerializer):
+    """
+    Validates a batch of blogs with a fixed number of queries: title uniqueness, authors and
+    tags are looked up once for the whole batch instead of once per item. Invalid items do
+    not fail the batch, their errors are kept in `item_errors` by index and only the valid
+    ones, listed in `valid_indexes`, end up in `validated_data`.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            message = self.error_messages['not_a_list'].format(input_type=type(data).__name__)
+            raise serializers.ValidationError({'non_field_errors': [message]}, code='not_a_list')
+        if not data:
+            raise serializers.ValidationError({'non_field_errors': [self.error_messages['empty']]}, code='empty')
+        if self.max_length is not None and len(data) > self.max_length:
+            message = self.error_messages['max_length'].format(max_length=self.max_length)
+            raise serializers.ValidationError({'non_field_errors': [message]}, code='max_length')
+
+        items = {}
+        self.item_errors = {}
+        for index, item in enumerate(data):
+            try:
+                items[index] = self.child.run_validation(item)
+            except serializers.ValidationError as exc:
+                self.item_errors[index] = exc.detail
+        self._check_references(items)
+        self.valid_indexes = list(items)
+        return list(items.values())
+
+    def _check_references(self, items):
+        taken_titles = set(models.Blog.objects.filter(
+            title__in={item['title'] for item in items.values()},
+        ).values_list('title', flat=True))
+        author_ids = set(Author.objects.filter(
+            pk__in={item['author'] for item in items.values()},
+        ).values_list('pk', flat=True))
+        tag_ids = set(models.Tag.objects.filter(
+            pk__in={tag_id for item in items.values() for tag_id in item['tags']},
+        ).values_list('pk', flat=True))
+
+        for index, item in list(items.items()):
+            errors = {}
+            if item['title'] in taken_titles:
+                errors['title'] = ['blog with this title already exists.']
+            if item['author'] not in author_ids:
+                errors['author'] = [f'Invalid pk "{item["author"]}" - object does not exist.']
+            missing_tags = [tag_id for tag_id in item['tags'] if tag_id not in tag_ids]
+            if missing_tags:
+                errors['tags'] = [f'Invalid pk "{tag_id}" - object does not exist.' for tag_id in missing_tags]
+            if errors:
+                self.item_errors[index] = errors
+                del items[index]
+            else:
+                # Later items with the same title are duplicates.
+                taken_titles.add(item['title'])
+
+    def create(self, validated_data):
+        return bulk_create_blogs(validated_data)
+
+
+class BulkBlogSerializer(serializers.Serializer):
+    """One blog of a bulk request, created together with its cover image."""
+    title = serializers.CharField(max_length=100)
+    content = serializers.CharField()
+    author = serializers.IntegerField()
+    cover_image_link = serializers.URLField(max_length=200)
+    tags = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    class Meta:
+        list_serializer_class = BulkBlogListSerializer
@@ -1,5 +1,89 @@
+from celery import chord
+from django.conf import settings
+from django.core import mail
+
+from author.public import get_follower_emails
+from author.public import iter_follower_ranges
+from blog.models import Blog
+from common.logging_util import log_event
+from common.redis_util import get_redis_connection
 from config.celery import task
 
+# Emails are handed to the mail backend and checkpointed this many at a time.
+EMAIL_CHUNK_SIZE = 100
+# A completed fan-out is remembered this long, publishing the blog again sends nothing.
+FANOUT_DONE_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def _checkpoint_key(blog_id):
+    return f'follower-emails:{blog_id}:checkpoints'
+
+
+def _started_key(blog_id):
+    return f'follower-emails:{blog_id}:started'
+
+
+def _done_key(blog_id):
+    return f'follower-emails:{blog_id}:done'
+
+
 @task(bind=True)
 def send_email_to_followers(self, author_id, blog_id):
-    print(f"Sending email to followers of author {author_id} for blog {blog_id}")
\ No newline at end of file
+    """
+    Fans the follower emails of a new blog out to batch tasks running in parallel, followed
+    by a summary once all of them are done. This task only pages through the follower ids,
+    each batch covers FOLLOWER_EMAIL_BATCH_SIZE followers. Only the first call for a blog fans
+    out, publishing it again while its emails are being sent or after they were sent does nothing.
+    """
+    author_id, blog_id = int(author_id), int(blog_id)
+    if not get_redis_connection().set(_started_key(blog_id), 1, nx=True, ex=FANOUT_DONE_TIMEOUT):
+        return
+    batches = [
+        send_email_batch_to_followers.si(author_id, blog_id, after_user_id, upto_user_id)
+        for after_user_id, upto_user_id in iter_follower_ranges(author_id, settings.FOLLOWER_EMAIL_BATCH_SIZE)
+    ]
+    if batches:
+        chord(batches)(summarize_follower_emails.s(author_id, blog_id))
+
+
+@task(bind=True, acks_late=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
+def send_email_batch_to_followers(self, author_id, blog_id, after_user_id, upto_user_id):
+    """
+    Emails the followers with a user id in (after_user_id, upto_user_id] and returns how many were sent.
+    Progress is checkpointed in Redis, a retried or redelivered batch continues where it stopped
+    and one redelivered after the fan-out completed sends nothing.
+    """
+    redis = get_redis_connection()
+    if redis.exists(_done_key(blog_id)):
+        return 0
+    checkpoint_key = _checkpoint_key(blog_id)
+    last_field, sent_field = f'{after_user_id}:last', f'{after_user_id}:sent'
+    last_sent = redis.hget(checkpoint_key, last_field)
+    start = int(last_sent) if last_sent is not None else after_user_id
+
+    blog = Blog.objects.filter(pk=blog_id).values('title').first()
+    if blog is not None and start < upto_user_id:
+        recipients = get_follower_emails(author_id, start, upto_user_id)
+        with mail.get_connection() as connection:
+            for i in range(0, len(recipients), EMAIL_CHUNK_SIZE):
+                chunk = recipients[i:i + EMAIL_CHUNK_SIZE]
+                connection.send_messages([
+                    mail.EmailMessage(f'New blog: {blog["title"]}', f'A new blog "{blog["title"]}" was published.', to=[email])
+                    for _, email in chunk
+                ])
+                with redis.pipeline() as pipe:
+                    pipe.hset(checkpoint_key, last_field, chunk[-1][0])
+                    pipe.hincrby(checkpoint_key, sent_field, len(chunk))
+                    pipe.expire(checkpoint_key, FANOUT_DONE_TIMEOUT)
+                    pipe.execute()
+    return int(redis.hget(checkpoint_key, sent_field) or 0)
+
+
+@task
+def summarize_follower_emails(sent_counts, author_id, blog_id):
+    sent = sum(sent_counts)
+    log_event('follower_emails_sent', {'author_id': author_id, 'blog_id': blog_id, 'batches': len(sent_counts), 'sent': sent})
+    redis = get_redis_connection()
+    redis.set(_done_key(blog_id), sent, ex=FANOUT_DONE_TIMEOUT)
+    redis.delete(_checkpoint_key(blog_id))
+    return sent
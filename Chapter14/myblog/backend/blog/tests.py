@@ -1,14 +1,41 @@
+import csv
+import io
+import json
+from collections import Counter
+from unittest import mock
+
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
+from rest_framework import serializers
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from django.contrib import admin
 from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import RequestFactory
+from django.test import override_settings
 from django.utils import timezone
 from django.test import tag
 
 from freezegun import freeze_time
 
 from blog.factoryboy import BlogFactory, AuthorFactory
+from author.models import Author
+from author.models import Follower
+from author.public import follow
 from blog import public
+from blog import tasks
+from blog import views
+from blog.admin import BlogCustomAdmin
+from blog.models import Blog
+from blog.models import Tag
+from blog.serializers import BlogSerializer
+from common.caching import local_cache
+from common.eager_loading import optimize_queryset
+from common.fast_serializers import compile_serializer
+from config.celery import app
 
 #
 class BasicTests(APITestCase):
@@ -181,4 +208,343 @@ class BlogTests8(APITestCase):
 
     @tag("slow", "core")
     def test_slow_but_core(self):
-        print("slow but core test running")
\ No newline at end of file
+        print("slow but core test running")
+
+
+class BlogTests9(APITestCase):
+    def setUp(self):
+        self.url = '/blog/paginated/'
+        self.blogs = BlogFactory.create_batch(5)
+
+    def test_cursor_pagination_walks_all_blogs(self):
+        # Newest blogs come first, blogs created in the same instant are ordered by id.
+        expected_ids = [blog.id for blog in sorted(self.blogs, key=lambda b: (b.created_at, b.id), reverse=True)]
+        seen_ids = []
+        cursor = ''
+        while cursor is not None:
+            resp = self.client.get(self.url, {'cursor': cursor, 'page_size': 2}, format='json')
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            seen_ids.extend(blog['id'] for blog in resp.data['blogs'])
+            last_resp = resp
+            cursor = resp.data['next_cursor']
+        self.assertEqual(seen_ids, expected_ids)
+
+        # Going back from the last page returns the page before it.
+        resp = self.client.get(self.url, {'cursor': last_resp.data['prev_cursor'], 'page_size': 2}, format='json')
+        self.assertEqual([blog['id'] for blog in resp.data['blogs']], expected_ids[2:4])
+
+    def test_invalid_cursor(self):
+        resp = self.client.get(self.url, {'cursor': 'not-a-cursor'}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_page_number_pagination(self):
+        resp = self.client.get(self.url, {'page': 2, 'page_size': 2}, format='json')
+        self.assertEqual([blog['id'] for blog in resp.data['blogs']], [self.blogs[2].id, self.blogs[3].id])
+
+
+class BlogTests10(APITestCase):
+    def setUp(self):
+        self.url = '/blog/unpaginated/'
+        self.blogs = BlogFactory.create_batch(3)
+
+    def test_ndjson_export(self):
+        resp = self.client.get(self.url, {'format': 'ndjson'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [blog.id for blog in self.blogs])
+
+    def test_csv_export(self):
+        resp = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(io.StringIO(b''.join(resp.streaming_content).decode())))
+        self.assertEqual([row['title'] for row in rows], [blog.title for blog in self.blogs])
+
+
+class BlogTests11(APITestCase):
+    def test_compiled_serializer_matches_blog_serializer(self):
+        tags = [Tag.objects.create(name=f'tag {i}') for i in range(3)]
+        for index, blog in enumerate(BlogFactory.create_batch(4)):
+            blog.tags.set(tags[:index])
+        queryset = Blog.objects.order_by('id')
+
+        expected = JSONRenderer().render(BlogSerializer(queryset, many=True).data)
+        with self.assertNumQueries(2):
+            actual = JSONRenderer().render(compile_serializer(BlogSerializer).serialize(queryset))
+        self.assertEqual(actual, expected)
+
+
+class BASerializer(serializers.Serializer):
+    name = serializers.CharField()
+    email = serializers.EmailField()
+
+
+class BlogWithAuthorSerializer(serializers.ModelSerializer):
+    author_details = BASerializer(source='author')
+    tag_names = serializers.SlugRelatedField(source='tags', slug_field='name', many=True, read_only=True)
+
+    class Meta:
+        model = Blog
+        fields = ['id', 'title', 'author_details', 'tag_names']
+
+
+class BlogTests12(APITestCase):
+    def setUp(self):
+        tags = [Tag.objects.create(name=f'tag {i}') for i in range(3)]
+        for blog in BlogFactory.create_batch(5):
+            blog.tags.set(tags)
+
+    def test_blog_serializer_query_count(self):
+        # One query for the blogs and one for all of their tags.
+        with self.assertNumQueries(2):
+            BlogSerializer(Blog.objects.all(), many=True).data
+
+    def test_nested_serializer_query_count(self):
+        queryset = optimize_queryset(Blog.objects.all(), BlogWithAuthorSerializer)
+        with self.assertNumQueries(2):
+            data = BlogWithAuthorSerializer(queryset, many=True).data
+        self.assertEqual(len(data), 5)
+        self.assertEqual(data[0]['tag_names'], ['tag 0', 'tag 1', 'tag 2'])
+
+
+class BlogTests13(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.author = AuthorFactory()
+        BlogFactory(author=self.author)
+
+    def test_cached_blogs_invalidated_on_change(self):
+        self.assertEqual(len(views.get_all_blogs(self.author.id)), 1)
+        # Served from the cache.
+        with self.assertNumQueries(0):
+            self.assertEqual(len(views.get_all_blogs(self.author.id)), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            blog = BlogFactory(author=self.author)
+        self.assertEqual(len(views.get_all_blogs(self.author.id)), 2)
+
+        tag = Tag.objects.create(name='django')
+        with self.captureOnCommitCallbacks(execute=True):
+            blog.tags.add(tag)
+        self.assertIn([tag.id], [data['tags'] for data in views.get_all_blogs(self.author.id)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            blog.delete()
+        self.assertEqual(len(views.get_all_blogs(self.author.id)), 1)
+
+
+@override_settings(FOLLOWER_EMAIL_BATCH_SIZE=2, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class BlogTests14(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.blog = BlogFactory()
+        self.users = [User.objects.create_user(f'f{i}', f'f{i}@abc.co') for i in range(5)]
+        for user in self.users:
+            follow(self.blog.author_id, user.id)
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+
+    def send(self):
+        tasks.send_email_to_followers.delay(self.blog.author_id, self.blog.id)
+
+    def test_followers_emailed_in_batches_once(self):
+        self.send()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), sorted(user.email for user in self.users))
+        # Publishing again does not email anyone twice.
+        self.send()
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_batch_resumes_from_checkpoint(self):
+        after, upto = 0, self.users[2].id
+        # The first follower of this batch was emailed before the task failed.
+        key = tasks._checkpoint_key(self.blog.id)
+        tasks.get_redis_connection().hset(key, mapping={f'{after}:last': self.users[0].id, f'{after}:sent': 1})
+        sent = tasks.send_email_batch_to_followers(self.blog.author_id, self.blog.id, after, upto)
+        self.assertEqual(sent, 3)
+        self.assertEqual([message.to[0] for message in mail.outbox], [self.users[1].email, self.users[2].email])
+
+    def test_publishing_twice_while_sending_emails_once(self):
+        # The chords run after both requests, as if the workers were busy.
+        chords = []
+        with mock.patch('blog.tasks.chord', side_effect=lambda header: lambda body: chords.append((header, body))):
+            for _ in range(2):
+                self.client.get('/blog/publish/', {'author_id': self.blog.author_id, 'blog_id': self.blog.id})
+        self.assertEqual(len(chords), 1)
+        header, body = chords[0]
+        body.delay([batch.delay().get() for batch in header])
+        # A batch redelivered after the summary sends nothing.
+        header[0].delay()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), sorted(user.email for user in self.users))
+
+
+class BlogTests15(APITestCase):
+    def setUp(self):
+        cache.clear()
+        # Author ids are reused by later tests, don't leave counters behind.
+        self.addCleanup(cache.clear)
+        self.author = AuthorFactory()
+
+    def test_daily_count_is_kept_in_redis(self):
+        BlogFactory(author=self.author)
+        self.assertEqual(public.get_blogs_created_today(self.author.id), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogFactory.create_batch(2, author=self.author)
+        with self.assertNumQueries(0):
+            self.assertEqual(public.get_blogs_created_today(self.author.id), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Blog.objects.filter(author=self.author).first().delete()
+        self.assertEqual(public.get_blogs_created_today(self.author.id), 2)
+
+
+class BlogTests16(APITestCase):
+    def setUp(self):
+        self.url = '/blog/search/'
+        self.content_match = BlogFactory(title='Scaling web apps', content='Notes on django performance')
+        self.title_match = BlogFactory(title='Django performance tips', content='Profiling first')
+        BlogFactory(title='Unrelated', content='Nothing to see')
+
+    def test_search_ranks_title_matches_first(self):
+        resp = self.client.get(self.url, {'q': 'django'}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([blog['id'] for blog in resp.data['blogs']], [self.title_match.id, self.content_match.id])
+        self.assertNotIn('search_vector', resp.data['blogs'][0])
+
+    def test_search_requires_a_term(self):
+        resp = self.client.get(self.url, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.data['error_code'], 'B0014')
+
+    def test_search_rejects_invalid_limits(self):
+        for limit in ['abc', '0', '-5']:
+            resp = self.client.get(self.url, {'q': 'django', 'limit': limit}, format='json')
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(resp.data['error_code'], 'B0016')
+        resp = self.client.get(self.url, {'q': 'django', 'limit': 1}, format='json')
+        self.assertEqual([blog['id'] for blog in resp.data['blogs']], [self.title_match.id])
+
+
+class BlogTests17(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = '/blog/autocomplete/'
+        for title in ['Django tips', 'django testing', 'Flask tips', 'Djangonaut diaries']:
+            BlogFactory(title=title)
+
+    def test_autocomplete_returns_matching_titles(self):
+        resp = self.client.get(self.url, {'q': 'DJANGO'}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(
+            [blog['title'] for blog in resp.data['results']],
+            ['Django tips', 'django testing', 'Djangonaut diaries'],
+        )
+        self.assertEqual(set(resp.data['results'][0]), {'id', 'title'})
+        # Popular prefixes are served from the cache.
+        with self.assertNumQueries(0):
+            self.client.get(self.url, {'q': 'django'}, format='json')
+
+    def test_short_prefix_returns_nothing(self):
+        resp = self.client.get(self.url, {'q': 'dj'}, format='json')
+        self.assertEqual(resp.data['results'], [])
+
+
+class BlogTests18(APITestCase):
+    def setUp(self):
+        self.modeladmin = BlogCustomAdmin(Blog, admin.site)
+        self.user = User.objects.create_superuser('admin', 'admin@abc.co', 'password')
+        self.blogs = [BlogFactory(title=title) for title in ['Django tips', 'Flask tips', 'Django testing']]
+
+    def export(self, **params):
+        request = RequestFactory().get('/admin/blog/blog/export/', params)
+        request.user = self.user
+        return self.modeladmin.export_view(request)
+
+    def test_export_view_streams_the_filtered_changelist(self):
+        resp = self.export(q='django', o='1')
+        self.assertEqual(resp['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(b''.join(resp.streaming_content).decode())))
+        self.assertEqual([row['title'] for row in rows], ['Django testing', 'Django tips'])
+        self.assertEqual(rows[0]['author_name'], self.blogs[2].author.name)
+        self.assertNotIn('content', rows[0])
+
+    def test_export_view_includes_content_on_request(self):
+        resp = self.export(format='ndjson', content='1')
+        lines = [json.loads(line) for line in b''.join(resp.streaming_content).decode().splitlines()]
+        self.assertEqual(len(lines), 3)
+        self.assertEqual({line['content'] for line in lines}, {blog.content for blog in self.blogs})
+
+    def test_export_action_streams_the_selection(self):
+        request = RequestFactory().post('/')
+        request.user = self.user
+        resp = self.modeladmin.export_ndjson(request, Blog.objects.filter(pk=self.blogs[1].pk))
+        lines = b''.join(resp.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Flask tips'])
+
+
+class BlogTests19(APITestCase):
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.url = '/blog/bulk/'
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@abc.co', 'password'))
+        self.author = AuthorFactory()
+        self.tags = [Tag.objects.create(name=f'tag {i}') for i in range(2)]
+        BlogFactory(title='Taken')
+
+    def item(self, title, **kwargs):
+        return {'title': title, 'content': 'Lorem ipsum', 'author': self.author.id,
+                'cover_image_link': 'https://example.com/cover.png', 'tags': [tag.id for tag in self.tags], **kwargs}
+
+    def test_bulk_create_reports_invalid_items(self):
+        items = [self.item(f'Bulk {i}') for i in range(50)]
+        items[1]['title'] = 'Taken'
+        items[2]['title'] = 'Bulk 0'
+        items[3]['author'] = 0
+        items[4]['cover_image_link'] = 'not a link'
+        # Three lookups and three inserts (plus the savepoint) however many blogs are sent.
+        with self.assertNumQueries(8):
+            resp = self.client.post(self.url, items, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual([error['index'] for error in resp.data['errors']], [1, 2, 3, 4])
+        self.assertEqual(set(resp.data['errors'][3]['errors']), {'cover_image_link'})
+        self.assertEqual(len(resp.data['created']), 46)
+
+        blog = Blog.objects.get(pk=resp.data['created'][0]['id'])
+        self.assertEqual(blog.title, 'Bulk 0')
+        self.assertEqual(blog.cover_image.image_link, 'https://example.com/cover.png')
+        self.assertCountEqual(blog.tags.all(), self.tags)
+        self.assertEqual(public.get_blogs_created_today(self.author.id), 46)
+
+    def test_bulk_create_requires_a_list(self):
+        resp = self.client.post(self.url, self.item('Single'), format='json')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.data['error_code'], 'B0015')
+
+
+class BlogTests20(APITestCase):
+    def test_seed_blogs_generates_skewed_data(self):
+        existing_blog = BlogFactory()
+        call_command('seed_blogs', authors=20, blogs=500, tags=40, followers=95, chunk_size=100, workers=2, stdout=io.StringIO())
+
+        seeded = Blog.objects.exclude(pk=existing_blog.pk)
+        self.assertEqual(seeded.count(), 500)
+        self.assertEqual(Author.objects.count(), 21)
+        self.assertEqual(Follower.objects.count(), 95)
+        self.assertEqual(Blog.tags.through.objects.filter(blog__in=seeded).values('blog').distinct().count(), 500)
+        # Zipfian: the most prolific author wrote a large share of the blogs.
+        per_author = sorted(Counter(seeded.values_list('author_id', flat=True)).values(), reverse=True)
+        self.assertGreater(per_author[0], 500 // 10)
+        self.assertGreater(per_author[0], 4 * per_author[len(per_author) // 2])
+
+
+class BlogTests21(APITestCase):
+    def test_bulk_create_batch_saves_each_model_at_once(self):
+        first, = BlogFactory.build_batch(1)
+        # Authors, cover images and blogs.
+        with self.assertNumQueries(3):
+            blogs = BlogFactory.bulk_create_batch(20)
+        self.assertEqual(Blog.objects.filter(pk__in=[blog.pk for blog in blogs]).count(), 20)
+        # Sequences continue as with create_batch.
+        first_number = int(first.title.split()[-1])
+        self.assertEqual([blog.title for blog in blogs], [f'Blog {first_number + n}' for n in range(1, 21)])
+        saved = Blog.objects.select_related('author', 'cover_image').get(pk=blogs[0].pk)
+        self.assertEqual((saved.author, saved.cover_image), (blogs[0].author, blogs[0].cover_image))
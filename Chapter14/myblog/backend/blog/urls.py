@@ -8,6 +8,9 @@ urlpatterns = [
     path('perm-check/', views.update_blog_title),
     path('unpaginated/', views.get_blog_without_pagination),
     path('paginated/', views.get_blog_with_pagination),
+    path('search/', views.search_blogs),
+    path('autocomplete/', views.autocomplete_blog_titles),
+    path('bulk/', views.bulk_create_blogs),
     path('publish/', views.publish_blog),
     path('verify/', views.verify_blog),
     path('hello-world/', views.hello_world, name='hello_world'),
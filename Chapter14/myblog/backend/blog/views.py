@@ -1,25 +1,51 @@
+from django.conf import settings
+from django.db import IntegrityError
 from django.http import HttpResponse
 
-from cacheops import cached
+from rest_framework import serializers
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.throttling import AnonRateThrottle
-from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAdminUser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import authentication_classes
 from rest_framework.decorators import permission_classes
+from rest_framework.decorators import renderer_classes
+from rest_framework.settings import api_settings
 
 
+from blog import search
 from blog.tasks import send_email_to_followers
+from blog.exports import EXPORT_CHUNK_SIZE
+from blog.exports import streaming_export_response
 from blog.models import Blog
+from blog.pagination import InvalidCursor
+from blog.pagination import paginate_by_keyset
+from blog.public import BLOGS_BY_AUTHOR_CACHE
+from blog.search import MAX_SEARCH_RESULTS
+from blog.renderers import CSVRenderer
+from blog.renderers import NDJSONRenderer
 from blog.serializers import BlogSerializer
+from blog.serializers import BulkBlogSerializer
+from blog.serializers import MAX_BULK_BLOGS
+from common.caching import single_flight_cached
+from common.caching import versioned_cached
+from common.fast_serializers import compile_serializer
 from common.logging_util import log_event
+from common.paginator import estimated_count
+from common.permissions import user_in_group
+from common.throttling import AnonRateThrottle
+from common.throttling import ScopedRateThrottle
 from config.celery import debug_task
 
 
+# Title autocomplete, see autocomplete_blog_titles.
+AUTOCOMPLETE_MIN_LENGTH = 3
+AUTOCOMPLETE_CACHE_TIMEOUT = 60
+
+
 def update_blog_title(request):
     blog_id = request.GET.get('id')
     blog = Blog.objects.get(id=blog_id)
@@ -30,7 +56,7 @@ def update_blog_title(request):
 
 
 def check_permission(user, group_name):
-    return user.groups.filter(name=group_name).exists()
+    return user_in_group(user, group_name)
 
 
 @api_view(['POST'])
@@ -41,12 +67,13 @@ def blog_view(request):
     return Response(status=200)
 
 
-# Cache the result of this function for 10 minutes, it would be unique for each author_id.
-@cached(timeout=60*10)
+# Cache the result of this function per author_id, in this process and in Redis. Saving or deleting
+# one of the author's blogs, or changing its tags, drops the author's entries right away (see blog.receivers).
+@versioned_cached(BLOGS_BY_AUTHOR_CACHE, timeout=settings.BLOGS_BY_AUTHOR_CACHE_TIMEOUT, local=True)
 def get_all_blogs(author_id):
     print('Fetching blogs from database')
     blogs = Blog.objects.filter(author_id=author_id)
-    blogs_data = BlogSerializer(blogs, many=True).data
+    blogs_data = compile_serializer(BlogSerializer).serialize(blogs)
     return blogs_data
 
 
@@ -108,25 +135,100 @@ class Blog3ApiView(APIView):
 
 
 # Unpaginated view for blogs returning all the blogs in the database.
+# `?format=ndjson` or `?format=csv` streams the table instead, reading it through a
+# server-side cursor and serializing it chunk by chunk so memory stays flat.
 @api_view(['GET'])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer, CSVRenderer])
 def get_blog_without_pagination(request):
-    blogs = Blog.objects.all()
-    blogs_data = BlogSerializer(blogs, many=True).data
+    export_format = request.accepted_renderer.format
+    if export_format in ('ndjson', 'csv'):
+        serializer = compile_serializer(BlogSerializer)
+        rows = serializer.iter_serialize(Blog.objects.order_by('id'), chunk_size=EXPORT_CHUNK_SIZE)
+        return streaming_export_response(rows, export_format, serializer.field_names, filename='blogs')
+
+    blogs_data = compile_serializer(BlogSerializer).serialize(Blog.objects.all())
     return Response({'blogs': blogs_data})
 
 
 # Paginated view for blogs returning 10 blogs per page.
+# Passing `cursor` (empty for the first page) switches to keyset pagination, where every
+# page costs the same no matter how deep it is. `page`/`page_size` keep working for old clients.
 @api_view(['GET'])
 def get_blog_with_pagination(request):
-    page = int(request.GET.get('page', 1))
     page_size = int(request.GET.get('page_size', 10))
+    serializer = compile_serializer(BlogSerializer)
+    if 'cursor' in request.GET:
+        try:
+            rows, next_cursor, prev_cursor = paginate_by_keyset(
+                serializer.values(Blog.objects.all()), request.GET['cursor'], page_size
+            )
+        except InvalidCursor:
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={'error': 'Invalid cursor', 'error_code': 'B0013'})
+        blogs_data = serializer.to_representation_many(rows)
+        return Response({'blogs': blogs_data, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor})
+
+    page = int(request.GET.get('page', 1))
     offset = (page-1)*page_size
     limit = page*page_size
-    blogs = Blog.objects.all()[offset:limit]
-    blogs_data = BlogSerializer(blogs, many=True).data
+    blogs = Blog.objects.order_by('id')[offset:limit]
+    blogs_data = serializer.serialize(blogs)
+    # Approximate on large tables, counting every row on each page load is too slow.
+    return Response({'blogs': blogs_data, 'count': estimated_count(Blog.objects.all())})
+
+
+# Full text search over title and content, best matches first, see blog.search.
+@api_view(['GET'])
+def search_blogs(request):
+    search_term = request.GET.get('q', '').strip()
+    if not search_term:
+        return Response(status=status.HTTP_400_BAD_REQUEST, data={'error': 'Search term is required', 'error_code': 'B0014'})
+    try:
+        limit = serializers.IntegerField(min_value=1).run_validation(request.GET.get('limit', 20))
+    except serializers.ValidationError as e:
+        return Response(status=status.HTTP_400_BAD_REQUEST, data={'error': {'limit': e.detail}, 'error_code': 'B0016'})
+    limit = min(limit, MAX_SEARCH_RESULTS)
+    blogs = search.search_blogs(search_term).order_by('-search_rank', '-id')[:limit]
+    blogs_data = compile_serializer(BlogSerializer).serialize(blogs)
     return Response({'blogs': blogs_data})
 
 
+@single_flight_cached(timeout=AUTOCOMPLETE_CACHE_TIMEOUT)
+def get_title_suggestions(prefix):
+    return [{'id': blog_id, 'title': title} for blog_id, title in search.suggest_titles(prefix)]
+
+
+# Title suggestions while typing. Shorter prefixes match too many titles for the trigram index
+# to help, they return nothing. Popular prefixes are served from the cache.
+@api_view(['GET'])
+def autocomplete_blog_titles(request):
+    prefix = request.GET.get('q', '').strip().lower()
+    if len(prefix) < AUTOCOMPLETE_MIN_LENGTH:
+        return Response({'results': []})
+    return Response({'results': get_title_suggestions(prefix)})
+
+
+# Creates up to MAX_BULK_BLOGS blogs per request with a handful of queries, see blog.public.bulk_create_blogs.
+# Invalid items are reported by their index in the request and don't stop the others from being created.
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def bulk_create_blogs(request):
+    for attempt in range(2):
+        serializer = BulkBlogSerializer(data=request.data, many=True, max_length=MAX_BULK_BLOGS)
+        if not serializer.is_valid():
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={'error': serializer.errors, 'error_code': 'B0015'})
+        try:
+            blogs = serializer.save() if serializer.validated_data else []
+            break
+        except IntegrityError:
+            # A title was taken by a concurrent request since it was validated, validate again.
+            if attempt:
+                raise
+    created = [{'index': index, 'id': blog.id} for index, blog in zip(serializer.valid_indexes, blogs)]
+    errors = [{'index': index, 'errors': item_errors} for index, item_errors in sorted(serializer.item_errors.items())]
+    log_event('bulk_create_blogs', {'created': len(created), 'failed': len(errors)})
+    return Response({'created': created, 'errors': errors})
+
+
 @api_view(['GET'])
 def publish_blog(request):
     blog_id = request.GET.get('blog_id')
@@ -0,0 +1,226 @@
+import importlib
+import json
+import time
+import uuid
+from functools import wraps
+
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import HttpRequest
+from django.http import QueryDict
+
+from common.logging_util import log_event
+from common.redis_util import get_redis_connection
+from config.celery import task
+
+# Jobs and their progress are kept this long after they were started.
+JOB_TIMEOUT = 60 * 60 * 24
+# Most recent jobs listed above a changelist.
+RECENT_JOBS = 10
+
+
+def _job_key(job_id):
+    return f'admin-job:{job_id}'
+
+
+def _recent_jobs_key(model):
+    return f'admin-jobs:{model._meta.label_lower}'
+
+
+def background_action(description, chunk_size=1000):
+    """
+    Turns `handler(modeladmin, queryset)` into an admin action which returns right away and
+    runs in Celery instead, see run_background_action. The selection is stored as data the
+    worker rebuilds the queryset from: the selected primary keys, or the changelist filters when
+    "select all" was used. It is walked in primary key order `chunk_size` rows at a time, the
+    handler gets one queryset per chunk, with an instance of the ModelAdmin the action was run
+    from. Use it on a ModelAdmin with BackgroundActionsAdminMixin to see the progress.
+    """
+    def decorator(handler):
+        handler_path = f'{handler.__module__}:{handler.__qualname__}'
+
+        @admin.action(description=description)
+        @wraps(handler)
+        def action(modeladmin, request, queryset):
+            job_id = start_background_action(
+                handler_path, modeladmin.model, selection_of(request, queryset), chunk_size, description, request.user.pk,
+                admin_path=f'{type(modeladmin).__module__}:{type(modeladmin).__qualname__}',
+            )
+            modeladmin.message_user(request, f'"{description}" started in the background (job {job_id}).')
+
+        action.background_handler = handler
+        return action
+    return decorator
+
+
+def selection_of(request, queryset):
+    """
+    What the action was run on: `{'filters': [(name, values)]}`, the changelist's query string,
+    when all matching rows were selected, `{'pks': [...]}` otherwise.
+    """
+    if request.POST.get('select_across') == '1':
+        return {'filters': list(request.GET.lists())}
+    return {'pks': list(queryset.values_list('pk', flat=True))}
+
+
+def start_background_action(handler_path, model, selection, chunk_size, description, user_id=None, admin_path=None):
+    """
+    Queues a job running `handler_path` on the selection. `admin_path` is the ModelAdmin class
+    handed to the handler, by default the one registered for the model on the admin site.
+    """
+    job_id = uuid.uuid4().hex
+    redis = get_redis_connection()
+    with redis.pipeline() as pipe:
+        pipe.hset(_job_key(job_id), mapping={
+            'handler': handler_path,
+            'admin': admin_path or '',
+            'model': model._meta.label,
+            'selection': json.dumps(selection, default=str),
+            'chunk_size': chunk_size,
+            'description': description,
+            'user_id': user_id or '',
+            'status': 'queued',
+            'processed': 0,
+            'total': '',
+            'last_pk': '',
+            'started_at': int(time.time()),
+        })
+        pipe.expire(_job_key(job_id), JOB_TIMEOUT)
+        pipe.lpush(_recent_jobs_key(model), job_id)
+        pipe.ltrim(_recent_jobs_key(model), 0, RECENT_JOBS - 1)
+        pipe.expire(_recent_jobs_key(model), JOB_TIMEOUT)
+        pipe.execute()
+    transaction.on_commit(lambda: run_background_action.delay(job_id))
+    return job_id
+
+
+def get_job(job_id):
+    job = get_redis_connection().hgetall(_job_key(job_id))
+    if not job:
+        return None
+    job = {key.decode(): value for key, value in job.items()}
+    for key in ('handler', 'admin', 'model', 'description', 'status', 'total', 'last_pk', 'user_id'):
+        job[key] = job[key].decode()
+    job['id'] = job_id
+    job['selection'] = json.loads(job['selection'])
+    job['processed'] = int(job['processed'])
+    job['total'] = int(job['total']) if job['total'] else None
+    return job
+
+
+def get_recent_jobs(model):
+    job_ids = get_redis_connection().lrange(_recent_jobs_key(model), 0, -1)
+    return [job for job in (get_job(job_id.decode()) for job_id in job_ids) if job is not None]
+
+
+def _import_path(path):
+    module_name, qualname = path.split(':')
+    value = importlib.import_module(module_name)
+    for name in qualname.split('.'):
+        value = getattr(value, name)
+    return value
+
+
+def _get_modeladmin(job, model):
+    """The ModelAdmin the action was run from, None when there is none to rebuild."""
+    if job['admin']:
+        return _import_path(job['admin'])(model, admin.site)
+    return admin.site._registry.get(model)
+
+
+def _selected_queryset(job, model, modeladmin):
+    selection = job['selection']
+    if 'pks' in selection:
+        return model._default_manager.filter(pk__in=selection['pks'])
+    # Same filters, search and permissions as the changelist the action was started from.
+    request = HttpRequest()
+    request.method = 'GET'
+    request.GET = QueryDict(mutable=True)
+    for name, values in selection['filters']:
+        request.GET.setlist(name, values)
+    request.user = get_user_model()._default_manager.get(pk=job['user_id'])
+    changelist_class = modeladmin.get_changelist(request)
+
+    class SelectionChangeList(changelist_class):
+        def get_results(self, request):
+            # Only the queryset is needed, not the count and page queries of the changelist.
+            pass
+
+    modeladmin.get_changelist = lambda request, **kwargs: SelectionChangeList
+    return modeladmin.get_changelist_instance(request).queryset
+
+
+def _iter_pk_chunks(queryset, chunk_size):
+    chunk = []
+    for pk in queryset.values_list('pk', flat=True).iterator(chunk_size=chunk_size):
+        chunk.append(pk)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@task(bind=True, acks_late=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def run_background_action(self, job_id):
+    """
+    Runs a job created by a background admin action chunk by chunk. After every chunk the
+    progress and the last primary key handled are saved, a retried job continues from there.
+    """
+    job = get_job(job_id)
+    if job is None or job['status'] == 'done':
+        return
+    redis = get_redis_connection()
+    key = _job_key(job_id)
+    model = apps.get_model(job['model'])
+    handler = _import_path(job['handler'])
+    handler = getattr(handler, 'background_handler', handler)
+    modeladmin = _get_modeladmin(job, model)
+    if modeladmin is None and 'filters' in job['selection']:
+        # Nothing to rebuild the changelist selection with, retrying would not help.
+        redis.hset(key, 'status', 'failed')
+        log_event('background_admin_action_failed', {
+            'job_id': job_id, 'handler': job['handler'], 'error': f'{model._meta.label} has no ModelAdmin',
+        })
+        return
+
+    queryset = _selected_queryset(job, model, modeladmin).order_by('pk')
+    redis.hset(key, 'status', 'running')
+    if job['total'] is None:
+        redis.hset(key, 'total', queryset.count())
+    if job['last_pk']:
+        queryset = queryset.filter(pk__gt=model._meta.pk.to_python(job['last_pk']))
+
+    try:
+        for pks in _iter_pk_chunks(queryset, int(job['chunk_size'])):
+            handler(modeladmin, model._default_manager.filter(pk__in=pks).order_by('pk'))
+            with redis.pipeline() as pipe:
+                pipe.hincrby(key, 'processed', len(pks))
+                pipe.hset(key, 'last_pk', pks[-1])
+                pipe.execute()
+    except Exception:
+        redis.hset(key, 'status', 'failed' if self.request.retries >= self.max_retries else 'retrying')
+        raise
+    redis.hset(key, 'status', 'done')
+    job = get_job(job_id)
+    log_event('background_admin_action', {
+        'job_id': job_id, 'handler': job['handler'], 'processed': job['processed'],
+        'seconds': int(time.time()) - int(job['started_at']),
+    })
+
+
+class BackgroundActionsAdminMixin:
+    """Lists the recent background action jobs of the model, with their progress, above the changelist."""
+    change_list_template = 'admin/common/background_actions_change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        jobs = get_recent_jobs(self.model)
+        extra_context = {
+            **(extra_context or {}),
+            'background_jobs': jobs,
+            # The page reloads itself until they are finished.
+            'background_jobs_running': any(job['status'] in ('queued', 'running', 'retrying') for job in jobs),
+        }
+        return super().changelist_view(request, extra_context)
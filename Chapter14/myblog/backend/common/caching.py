@@ -0,0 +1,322 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from collections import defaultdict
+from collections import namedtuple
+from functools import wraps
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+
+from common.metrics import record_cache_access
+from common.redis_util import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache whose entries also expire after `ttl` seconds.
+
+    Entries are grouped by scope so that an invalidation can drop all of them at once.
+    Values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, scope, value)
+        self._scopes = defaultdict(set)
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return default
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def generation(self):
+        """
+        Token to take before reading the value from the source and to pass back to `set`.
+        The write is dropped if anything was evicted in between, the value might be stale.
+        """
+        return self._evictions
+
+    def set(self, key, value, scope, generation):
+        with self._lock:
+            if self._evictions != generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, scope, value)
+            self._scopes[scope].add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def evict_scope(self, scope):
+        with self._lock:
+            self._evictions += 1
+            for key in self._scopes.pop(scope, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._evictions += 1
+            self._entries.clear()
+            self._scopes.clear()
+
+    def _remove(self, key):
+        _, scope, _ = self._entries.pop(key)
+        keys = self._scopes[scope]
+        keys.discard(key)
+        if not keys:
+            del self._scopes[scope]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class InvalidationListener:
+    """
+    Keeps the local cache of this process in sync with the other workers.
+
+    `bump_cache_version` publishes the invalidated scope over Redis pub/sub and a daemon
+    thread evicts it locally. The local cache is only used while the subscription is up,
+    a lost connection could mean missed messages so the cache is cleared and bypassed until
+    the thread has subscribed again.
+    """
+
+    def __init__(self, local_cache, channel):
+        self.local_cache = local_cache
+        self.channel = channel
+        self.subscribed = False
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # Started lazily so every forked worker process gets its own thread.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.subscribed = False
+            threading.Thread(target=self._run, name='cache-invalidation', daemon=True).start()
+
+    def publish(self, scope):
+        get_redis_connection().publish(self.channel, json.dumps(scope))
+
+    def _run(self):
+        backoff = 1
+        while True:
+            try:
+                pubsub = get_redis_connection().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self.subscribed = True
+                backoff = 1
+                for message in pubsub.listen():
+                    self.local_cache.evict_scope(json.loads(message['data']))
+            except redis.RedisError:
+                logger.exception('Lost the cache invalidation subscription')
+            self.subscribed = False
+            self.local_cache.clear()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+local_cache = LocalCache(settings.LOCAL_CACHE['MAX_SIZE'], settings.LOCAL_CACHE['TTL'])
+invalidation_listener = InvalidationListener(local_cache, settings.LOCAL_CACHE['CHANNEL'])
+
+
+def _timed_get(key, count=True):
+    started = time.perf_counter()
+    value = cache.get(key)
+    record_cache_access(time.perf_counter() - started, hit=(value is not None) if count else None)
+    return value
+
+
+def _version_key(namespace, scope):
+    return f'cache-version:{namespace}:{scope}'
+
+
+def get_cache_version(namespace, scope):
+    """Returns the current version of the cached data belonging to `scope` (e.g. an author id)."""
+    key = _version_key(namespace, scope)
+    version = _timed_get(key, count=False)
+    if version is None:
+        # Start from a value no earlier version could have reached, if the key was evicted
+        # entries cached under the old version must not become visible again.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_cache_version(namespace, scope):
+    """Invalidates every entry cached for `scope`, in Redis and in the local cache of every worker."""
+    key = _version_key(namespace, scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+    local_scope = f'{namespace}:{scope}'
+    local_cache.evict_scope(local_scope)
+    invalidation_listener.publish(local_scope)
+
+
+def make_cache_key(namespace, scope, version, args, kwargs):
+    arguments = hashlib.md5(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+    return f'{namespace}:{scope}:{version}:{arguments}'
+
+
+# What is stored in Redis: the value, how long it took to compute and when it goes stale.
+_Entry = namedtuple('_Entry', ['value', 'delta', 'expires_at'])
+
+# Stale entries are kept this much longer than their timeout so they can be served
+# while a single worker recomputes them.
+STALE_GRACE = 60
+LOCK_TIMEOUT = 30
+# Longest a cold miss waits for another worker's value before computing it as well.
+COLD_MISS_WAIT = 5
+WAIT_INTERVAL = 0.05
+
+
+def _compute_and_store(key, compute, timeout):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    started = time.perf_counter()
+    cache.set(key, _Entry(value, delta, time.time() + timeout), timeout + STALE_GRACE)
+    record_cache_access(time.perf_counter() - started)
+    return value
+
+
+def _compute_under_lock(lock, key, compute, timeout, recheck=False):
+    try:
+        if recheck:
+            # The value may have been stored between our last read and the release.
+            entry = _timed_get(key, count=False)
+            if isinstance(entry, _Entry):
+                return entry.value
+        return _compute_and_store(key, compute, timeout)
+    finally:
+        try:
+            lock.release()
+        except redis.exceptions.LockError:
+            # Held longer than LOCK_TIMEOUT, someone else may be recomputing already.
+            pass
+
+
+def get_or_compute(key, compute, timeout, beta=1.0):
+    """
+    Returns the value cached under `key`, calling `compute` when it is missing or stale.
+
+    Only one caller across all workers recomputes a given key at a time, it holds a Redis
+    lock while the others keep serving the stale value, or wait for the fresh one on a cold
+    miss. Each read may also refresh the entry early, with a probability growing as expiry
+    approaches and as the value gets more expensive to compute (XFetch), so hot keys are
+    usually refreshed before they expire at all. `beta` above 1 favours earlier refreshes.
+    """
+    entry = _timed_get(key)
+    if not isinstance(entry, _Entry):
+        entry = None
+    if entry is not None and time.time() - entry.delta * beta * math.log(1 - random.random()) < entry.expires_at:
+        return entry.value
+
+    lock = get_redis_connection().lock(f'lock:{key}', timeout=LOCK_TIMEOUT)
+    if lock.acquire(blocking=False):
+        return _compute_under_lock(lock, key, compute, timeout)
+    if entry is not None:
+        return entry.value
+
+    # Cold miss while another worker computes the value, wait for it rather than piling
+    # onto the database. If that worker fails the lock is released without a value, the
+    # next waiter to take it computes instead. Compute it ourselves if nothing shows up in time.
+    deadline = time.monotonic() + COLD_MISS_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = _timed_get(key, count=False)
+        if isinstance(entry, _Entry):
+            return entry.value
+        if lock.acquire(blocking=False):
+            return _compute_under_lock(lock, key, compute, timeout, recheck=True)
+    return _compute_and_store(key, compute, timeout)
+
+
+def single_flight_cached(timeout=None, extra=None, beta=1.0):
+    """
+    Drop-in replacement for `cacheops.cached` protected against cache stampedes, see get_or_compute.
+    Like cacheops the key is built from the function and its arguments, `extra` can be used
+    to tell apart otherwise identical calls and `func.invalidate(*args, **kwargs)` drops an entry.
+    """
+    def decorator(func):
+        prefix = f'{func.__module__}.{func.__qualname__}'
+
+        def key_for(args, kwargs):
+            arguments = hashlib.md5(repr((args, sorted(kwargs.items()), extra)).encode()).hexdigest()
+            return f'cached:{prefix}:{arguments}'
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return get_or_compute(
+                key_for(args, kwargs),
+                lambda: func(*args, **kwargs),
+                cache.default_timeout if timeout is None else timeout,
+                beta,
+            )
+
+        wrapper.invalidate = lambda *args, **kwargs: cache.delete(key_for(args, kwargs))
+        return wrapper
+    return decorator
+
+
+def versioned_cached(namespace, timeout, local=False):
+    """
+    Caches the result of `func(scope, *args, **kwargs)` until `timeout` expires or
+    `bump_cache_version(namespace, scope)` is called, whichever comes first.
+
+    Since writers invalidate the entries explicitly the timeout can be long,
+    it only bounds how long unused entries stay around. Recomputations are single-flight,
+    see get_or_compute.
+    :param local: also keep hot entries in the in-process LocalCache, a hit there costs no
+        Redis round trip or unpickling. Use it for read-heavy data returned read-only.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(scope, *args, **kwargs):
+            if local:
+                invalidation_listener.ensure_started()
+                local_scope = f'{namespace}:{scope}'
+                local_key = (local_scope, args, tuple(sorted(kwargs.items())))
+                if invalidation_listener.subscribed:
+                    started = time.perf_counter()
+                    value = local_cache.get(local_key)
+                    if value is not _MISSING:
+                        record_cache_access(time.perf_counter() - started, hit=True)
+                        return value
+                generation = local_cache.generation()
+
+            version = get_cache_version(namespace, scope)
+            key = make_cache_key(namespace, scope, version, args, kwargs)
+            value = get_or_compute(key, lambda: func(scope, *args, **kwargs), timeout)
+
+            if local and invalidation_listener.subscribed:
+                local_cache.set(local_key, value, local_scope, generation)
+            return value
+        return wrapper
+    return decorator
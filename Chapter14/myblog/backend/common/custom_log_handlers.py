@@ -1,8 +1,124 @@
+import json
+import logging
 import os
+import queue
+import threading
+import time
 from logging.handlers import RotatingFileHandler
 
+_STOP = object()
+
 
 class MakeRotatingFileHandler(RotatingFileHandler):
     def __init__(self, filename, mode="a", maxBytes=1024 * 1024 * 10, backupCount=0, encoding=None, delay=0):
         os.makedirs(os.path.dirname(filename), exist_ok=True)
         RotatingFileHandler.__init__(self, filename, mode, maxBytes, backupCount, encoding, delay)
+
+
+class AsyncRotatingFileHandler(MakeRotatingFileHandler):
+    """
+    MakeRotatingFileHandler which does its formatting, rotation checks and writes on a
+    background thread, the logging call itself only puts the record on a queue.
+
+    The writer thread collects up to `batch_size` records, or whatever arrived within
+    `flush_interval` seconds, and writes them with a single write and flush.
+    The queue is bounded by `queue_size`: under overload records are dropped rather than
+    blocking requests, and the number of dropped records is logged with the next batch.
+    Pending records are written out when the handler is closed, `logging.shutdown()` does
+    that at interpreter exit.
+    """
+
+    def __init__(self, filename, mode="a", maxBytes=1024 * 1024 * 10, backupCount=0, encoding=None, delay=0,
+                 queue_size=10000, batch_size=500, flush_interval=1.0):
+        super().__init__(filename, mode, maxBytes, backupCount, encoding, delay)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, every worker process starts its own writer.
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self.queue = queue.Queue(maxsize=self.queue_size)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+
+    def emit(self, record):
+        self._ensure_worker()
+        if record.exc_info:
+            # Tracebacks keep frames alive and may change, render them right away.
+            record.exc_text = (self.formatter or logging.Formatter()).formatException(record.exc_info)
+            record.exc_info = None
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Called under the handler lock, the counter needs no extra locking.
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            self._write(batch)
+            if stop:
+                return
+
+    def _format(self, record):
+        try:
+            return self.format(record) + self.terminator
+        except Exception:
+            self.handleError(record)
+            return ''
+
+    def _dropped_record(self, count):
+        message = json.dumps({"ev": "log_records_dropped", "data": {"count": count}})
+        return logging.LogRecord(self.name or __name__, logging.WARNING, __file__, 0, message, None, None)
+
+    def _write(self, records):
+        dropped = self.dropped - self._reported_dropped
+        if dropped:
+            self._reported_dropped += dropped
+            records.append(self._dropped_record(dropped))
+        text = ''.join(self._format(record) for record in records)
+        if not text:
+            return
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self.stream.tell() and self.stream.tell() + len(text) >= self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(text)
+            self.stream.flush()
+        except Exception:
+            self.handleError(records[0])
+
+    def close(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout=10)
+        self._thread = None
+        super().close()
@@ -1,14 +1,231 @@
+import fcntl
+import glob
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from importlib import import_module
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.db.migrations.loader import MigrationLoader
 from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from common.redis_util import get_redis_connection
+
+
+# sqlite templates are kept here, outside the source tree.
+TEMPLATE_DIR = os.path.join(tempfile.gettempdir(), 'myblog-test-templates')
+# Templates of other hashes are dropped once unused for this many seconds.
+TEMPLATE_MAX_AGE = 60 * 60 * 24 * 7
+
+
+def seed_test_data(using):
+    """
+    Data every test database starts with, created once per template (see TemplateDatabase).
+    Changing this module builds a new template on the next run.
+    """
+    # Create any data
+
+
+def _hash_files(digest, paths):
+    for path in sorted(paths):
+        digest.update(os.path.relpath(path, settings.BASE_DIR).encode())
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+
+
+def template_hash(connection):
+    """Changes whenever a migration, the seed code or the database engine does."""
+    digest = hashlib.sha256(f'{django.__version__}:{connection.settings_dict["ENGINE"]}'.encode())
+    for app_config in sorted(apps.get_app_configs(), key=lambda app_config: app_config.label):
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        try:
+            module = import_module(module_name) if module_name else None
+        except ImportError:
+            module = None
+        if module is not None and getattr(module, '__file__', None):
+            _hash_files(digest, glob.glob(os.path.join(os.path.dirname(module.__file__), '*.py')))
+    _hash_files(digest, [__file__])
+    return digest.hexdigest()[:12]
+
+
+class TemplateDatabase:
+    """
+    Migrated and seeded copy of a test database, reused by later runs as long as its hash
+    matches: the test database is cloned from it with CREATE DATABASE ... TEMPLATE on Postgres
+    and a file copy on a file based sqlite database. Other setups are migrated every run.
+
+    Templates of other hashes (other branches, other checkouts) are kept until they have not
+    been used for TEMPLATE_MAX_AGE. Saving, cloning and dropping templates happen under a lock,
+    so concurrent runs never drop a template another one is cloning.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.creation = connection.creation
+        test_name = self.creation._get_test_db_name()
+        self.vendor = connection.vendor
+        self.supported = self.vendor == 'postgresql' or (
+            self.vendor == 'sqlite' and not self.creation.is_in_memory_db(test_name)
+        )
+        if self.vendor == 'sqlite':
+            # Out of the source tree, templates are shared by all checkouts of the project.
+            self.prefix = os.path.join(TEMPLATE_DIR, f'{os.path.basename(test_name)}_template_')
+        else:
+            self.prefix = f'{test_name}_template_'
+        self.name = self.prefix + template_hash(connection) if self.supported else None
+
+    @contextmanager
+    def _lock(self):
+        if self.vendor == 'sqlite':
+            os.makedirs(TEMPLATE_DIR, exist_ok=True)
+            with open(os.path.join(TEMPLATE_DIR, '.lock'), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+            return
+        key = int.from_bytes(hashlib.sha256(self.prefix.encode()).digest()[:8], 'big', signed=True)
+        with self.creation._nodb_cursor() as cursor:
+            # Session level, held by this connection while the other statements run on their own.
+            cursor.execute('SELECT pg_advisory_lock(%s)', [key])
+            try:
+                yield
+            finally:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [key])
+
+    def _list(self):
+        """Template names with the time they were last used."""
+        if self.vendor == 'sqlite':
+            return {
+                path: os.path.getmtime(path)
+                for path in glob.glob(glob.escape(self.prefix) + '*') if os.path.isfile(path)
+            }
+        with self.creation._nodb_cursor() as cursor:
+            cursor.execute(
+                "SELECT datname, shobj_description(oid, 'pg_database') FROM pg_database WHERE starts_with(datname, %s)",
+                [self.prefix],
+            )
+            return {name: float(last_used or 0) for name, last_used in cursor.fetchall()}
+
+    def _touch(self, name):
+        if self.vendor == 'sqlite':
+            os.utime(name)
+            return
+        with self.creation._nodb_cursor() as cursor:
+            cursor.execute(f"COMMENT ON DATABASE {self.creation._quote_name(name)} IS '{time.time():.0f}'")
+
+    def _drop(self, name):
+        if self.vendor == 'sqlite':
+            if os.path.exists(name):
+                os.remove(name)
+            return
+        with self.creation._nodb_cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS {self.creation._quote_name(name)}')
+
+    def _copy(self, source, target):
+        # A database can't be used as a template while connections to it are open.
+        self.connection.close()
+        self._drop(target)
+        if self.vendor == 'sqlite':
+            shutil.copyfile(source, target)
+            return
+        with self.creation._nodb_cursor() as cursor:
+            cursor.execute(
+                f'CREATE DATABASE {self.creation._quote_name(target)}'
+                f' {self.creation._get_database_create_suffix(template=source)}'
+            )
+
+    def save(self, test_database_name):
+        with self._lock():
+            for name, last_used in self._list().items():
+                if name != self.name and last_used < time.time() - TEMPLATE_MAX_AGE:
+                    self._drop(name)
+            self._copy(test_database_name, self.name)
+            self._touch(self.name)
+
+    def restore(self, test_database_name):
+        """Clones the template into the test database, returns False when there is no template."""
+        with self._lock():
+            if self.name not in self._list():
+                return False
+            self._copy(self.name, test_database_name)
+            self._touch(self.name)
+        return True
+
+    def create_test_db(self, verbosity=1, autoclobber=False, serialize=True, keepdb=False):
+        """Replaces connection.creation.create_test_db, with the same signature and result."""
+        test_database_name = self.creation._get_test_db_name()
+        if not self.supported or not self.restore(test_database_name):
+            test_database_name = self.creation.__class__.create_test_db(
+                self.creation, verbosity, autoclobber, serialize, keepdb,
+            )
+            print("### Populating Test Cases Database ###")
+            seed_test_data(self.connection.alias)
+            print("### Database populated ############")
+            if self.supported:
+                self.save(test_database_name)
+            return test_database_name
+
+        # Same steps as BaseDatabaseCreation.create_test_db, minus migrate.
+        if verbosity >= 1:
+            self.creation.log('Cloned test database for alias %s from %s.' % (
+                self.creation._get_database_display_str(verbosity, test_database_name), self.name,
+            ))
+        settings.DATABASES[self.connection.alias]['NAME'] = test_database_name
+        self.connection.settings_dict['NAME'] = test_database_name
+        if serialize:
+            self.connection._test_serialized_contents = self.creation.serialize_db_to_string()
+        call_command('createcachetable', database=self.connection.alias)
+        self.connection.ensure_connection()
+        return test_database_name
 
 
 class FillData:
     def setup_databases(self, *args, **kwargs):
-        temp = super(FillData, self).setup_databases(*args, **kwargs)
-        print("### Populating Test Cases Database ###")
-        # Create any data
-        print("### Database populated ############")
-        return temp
+        # Test databases are created from a seeded template instead of being migrated, parallel
+        # workers then clone the test database as usual. --keepdb keeps the test database
+        # after the run, it is still refreshed from the template at the start of the next one.
+        creations = [connections[alias].creation for alias in connections]
+        for creation in creations:
+            creation.create_test_db = TemplateDatabase(creation.connection).create_test_db
+        try:
+            return super(FillData, self).setup_databases(*args, **kwargs)
+        finally:
+            for creation in creations:
+                del creation.create_test_db
+
+
+def test_redis_settings():
+    """
+    Points the cache, cacheops and the shared Redis client at REDIS_TEST_DB. Tests call
+    cache.clear(), a FLUSHDB, which would otherwise wipe queued Celery tasks and cached data.
+    """
+    location = f'redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_TEST_DB}'
+    return {
+        'CACHES': {**settings.CACHES, 'default': {**settings.CACHES['default'], 'LOCATION': location}},
+        'CACHEOPS_REDIS': {**settings.CACHEOPS_REDIS, 'db': settings.REDIS_TEST_DB},
+        'REDIS_CONNECTION_STRING': location,
+    }
 
 
 class CustomRunner(FillData, DiscoverRunner):
-    pass
\ No newline at end of file
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(
+            # Any request issuing N+1 queries fails the test which made it.
+            NPLUSONE_DETECTION={**settings.NPLUSONE_DETECTION, 'ENABLED': True, 'STRICT': True},
+            **test_redis_settings(),
+        )
+        self.test_settings.enable()
+        get_redis_connection.cache_clear()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        get_redis_connection.cache_clear()
+        super().teardown_test_environment(**kwargs)
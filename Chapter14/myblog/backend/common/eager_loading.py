@@ -0,0 +1,123 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.db.models import QuerySet
+from rest_framework import relations
+from rest_framework import serializers
+
+
+class _LoadingPlan:
+    def __init__(self):
+        self.select = []
+        self.prefetch = []
+        self.only = []
+        # Cleared as soon as a field reads something we can not map to a column
+        # (properties, SerializerMethodField, ...), deferring columns would then cost a query per row.
+        self.restrict = True
+
+
+def _is_pk_only(field):
+    return isinstance(field, relations.RelatedField) and field.use_pk_only_optimization()
+
+
+def _add_fields(plan, serializer, model, prefix):
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            if isinstance(field, serializers.BaseSerializer):
+                _add_fields(plan, field, model, prefix)
+            else:
+                plan.restrict = False
+            continue
+        _add_source(plan, field, model, prefix, field.source_attrs)
+
+
+def _add_source(plan, field, model, prefix, attrs):
+    attr, rest = attrs[0], attrs[1:]
+    try:
+        model_field = model._meta.get_field(attr)
+    except FieldDoesNotExist:
+        plan.restrict = False
+        return
+    path = prefix + attr
+    if not model_field.is_relation:
+        plan.only.append(path)
+        return
+    if model_field.many_to_many or model_field.one_to_many:
+        plan.prefetch.append(_prefetch(field, model_field, path))
+        return
+
+    # Forward foreign keys and one-to-one relations in both directions can be joined.
+    if model_field.concrete:
+        plan.only.append(path)
+        if not rest and _is_pk_only(field):
+            # Only the `<name>_id` column is read.
+            return
+    plan.select.append(path)
+    if rest:
+        _add_source(plan, field, model_field.related_model, path + '__', rest)
+    elif isinstance(field, serializers.BaseSerializer):
+        _add_fields(plan, field, model_field.related_model, path + '__')
+    else:
+        plan.restrict = False
+
+
+def _prefetch(field, model_field, path):
+    related_model = model_field.related_model
+    queryset = related_model._default_manager.all()
+    if isinstance(field, serializers.ListSerializer):
+        # Reverse foreign keys are matched back to their parent through the foreign key column.
+        required = [model_field.field.name] if model_field.one_to_many else []
+        queryset = _apply_plan(queryset, _build_plan(field.child, related_model), required)
+    elif isinstance(field, relations.ManyRelatedField) and _is_pk_only(field.child_relation):
+        required = [model_field.field.name] if model_field.one_to_many else []
+        queryset = queryset.only(related_model._meta.pk.name, *required)
+    return Prefetch(path, queryset=queryset)
+
+
+def _build_plan(serializer, model):
+    plan = _LoadingPlan()
+    _add_fields(plan, serializer, model, '')
+    return plan
+
+
+def _apply_plan(queryset, plan, required=()):
+    if plan.select:
+        queryset = queryset.select_related(*plan.select)
+    if plan.prefetch:
+        queryset = queryset.prefetch_related(*plan.prefetch)
+    # Leave querysets which already restrict their columns alone.
+    if plan.restrict and plan.only and queryset.query.deferred_loading == (frozenset(), True):
+        queryset = queryset.only(*plan.only, *required)
+    return queryset
+
+
+def optimize_queryset(queryset, serializer):
+    """
+    Applies the select_related/prefetch_related/only() calls `serializer` needs so that
+    serializing the queryset costs a constant number of queries.
+
+    The plan is derived from the serializer fields: forward relations read through nested
+    serializers or dotted sources are joined, many relations are prefetched with their own
+    optimized queryset and, when every field maps to a column, unused columns are deferred.
+    :param serializer: serializer class or instance describing one object of the queryset
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if queryset._fields is not None:
+        # `.values()` querysets have nothing to load.
+        return queryset
+    return _apply_plan(queryset, _build_plan(serializer, queryset.model))
+
+
+class EagerLoadingListSerializer(serializers.ListSerializer):
+    """
+    List serializer which optimizes the queryset it is given before iterating it.
+    Enable it with `list_serializer_class = EagerLoadingListSerializer` in a serializer's Meta.
+    """
+
+    def to_representation(self, data):
+        # Nested lists get a related manager, possibly already prefetched by their parent.
+        if self.parent is None and isinstance(data, QuerySet) and data._result_cache is None:
+            data = optimize_queryset(data, self.child)
+        return super().to_representation(data)
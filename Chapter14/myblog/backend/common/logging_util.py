@@ -1,8 +1,9 @@
 import json
 import logging
 
-from common.localthread_middleware import get_current_user_id
-from common.localthread_middleware import get_txid
+from common.request_context import get_current_user_id
+from common.request_context import get_txid
+
 
 def log_event(event_name, log_data, logging_module="django_default", level="INFO"):
     """
@@ -10,8 +11,13 @@ def log_event(event_name, log_data, logging_module="django_default", level="INFO
     :param log_data: The data you want to log, this can be anything serializable
     :param logging_module: If you want to use any custom module for logging, define it in Django settings
     :param level: Level for which you are logging.
+
+    `log_data` is serialized right away, so errors show up here and not on the writer
+    thread of the async file handler, and later changes to it are not logged.
     """
     logger = logging.getLogger(logging_module)
+    if not logger.isEnabledFor(getattr(logging, level)):
+        return
 
     try:
         msg = {"ev": event_name, "data": log_data, "txid": get_txid()}
@@ -0,0 +1,22 @@
+from django.db.models import CharField
+from django.db.models import TextField
+from django.db.models.lookups import IStartsWith
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class TrigramIStartsWith(IStartsWith):
+    """
+    Case insensitive prefix match which can use a pg_trgm GIN index on Postgres:
+    `istartswith` compiles to UPPER(column) LIKE UPPER(...), which no plain column index serves,
+    this compiles to column ILIKE '...%' instead. Same as istartswith on other databases.
+    """
+    lookup_name = 'trigram_istartswith'
+
+    def as_sql(self, compiler, connection):
+        return IStartsWith(self.lhs, self.rhs).as_sql(compiler, connection)
+
+    def as_postgresql(self, compiler, connection):
+        lhs_sql, lhs_params = self.process_lhs(compiler, connection)
+        rhs_sql, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs_sql} ILIKE {rhs_sql}', (*lhs_params, *rhs_params)
@@ -0,0 +1,189 @@
+import os
+import threading
+from contextvars import ContextVar
+
+
+class Histogram:
+    """
+    Log-linear histogram in the style of HdrHistogram, for non negative integers.
+
+    Values below 2 ** sub_bucket_bits are counted exactly, larger ones fall into buckets
+    whose width grows with the value, keeping the relative error below 2 ** -(sub_bucket_bits - 1)
+    (about 3% by default) with a few hundred buckets at most. Recording is O(1).
+    """
+
+    def __init__(self, sub_bucket_bits=6):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self._lock = threading.Lock()
+
+    def _index(self, value):
+        shift = value.bit_length() - self.sub_bucket_bits
+        if shift <= 0:
+            return value
+        return (shift << self.sub_bucket_bits) + (value >> shift)
+
+    def _highest_value(self, index):
+        # The largest value counted in a bucket, percentiles never under-report.
+        shift = index >> self.sub_bucket_bits
+        if not shift:
+            return index
+        mantissa = index & ((1 << self.sub_bucket_bits) - 1)
+        return (mantissa << shift) + (1 << shift) - 1
+
+    def record(self, value):
+        value = max(int(value), 0)
+        index = self._index(value)
+        with self._lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, percent):
+        with self._lock:
+            counts = sorted(self.counts.items())
+            count, maximum = self.count, self.max
+        if not count:
+            return 0
+        target = max(count * percent / 100, 1)
+        seen = 0
+        for index, bucket_count in counts:
+            seen += bucket_count
+            if seen >= target:
+                return min(self._highest_value(index), maximum)
+        return maximum
+
+    def mean(self):
+        with self._lock:
+            return self.total / self.count if self.count else 0
+
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class ViewMetrics:
+    """Everything recorded for one view. Timings are kept in microseconds."""
+
+    def __init__(self):
+        self.wall = Histogram()
+        self.db = Histogram()
+        self.cache = Histogram()
+        self.queries = Histogram()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, wall_time, timings):
+        self.wall.record(wall_time * 1e6)
+        self.db.record(timings.db_time * 1e6)
+        self.cache.record(timings.cache_time * 1e6)
+        self.queries.record(timings.queries)
+        with self._lock:
+            self.cache_hits += timings.cache_hits
+            self.cache_misses += timings.cache_misses
+
+    def snapshot(self):
+        with self._lock:
+            cache_hits, cache_misses = self.cache_hits, self.cache_misses
+        data = {'requests': self.wall.count, 'cache_hits': cache_hits, 'cache_misses': cache_misses}
+        for name in ('wall', 'db', 'cache', 'queries'):
+            histogram = getattr(self, name)
+            data[name] = {f'p{percent:g}': histogram.percentile(percent) for percent in PERCENTILES}
+            data[name].update(mean=round(histogram.mean(), 1), max=histogram.max)
+        return data
+
+
+class RequestTimings:
+    """
+    Database and cache activity of the request being handled. Threads started with
+    ContextThreadPoolExecutor share it with the request, hence the lock.
+    """
+    __slots__ = ('db_time', 'queries', 'cache_time', 'cache_hits', 'cache_misses', 'lock')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.db_time = 0.0
+        self.queries = 0
+        self.cache_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+_current_timings = ContextVar('request_timings', default=None)
+
+
+def start_request_timings():
+    timings = RequestTimings()
+    return timings, _current_timings.set(timings)
+
+
+def end_request_timings(token):
+    _current_timings.reset(token)
+
+
+def record_query(seconds):
+    timings = _current_timings.get()
+    if timings is not None:
+        with timings.lock:
+            timings.db_time += seconds
+            timings.queries += 1
+
+
+def record_cache_access(seconds, hit=None):
+    """
+    Adds a cache round trip to the current request, if any.
+    :param hit: whether the value was found, None when the access only took time (e.g. a write)
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        return
+    with timings.lock:
+        timings.cache_time += seconds
+        if hit is True:
+            timings.cache_hits += 1
+        elif hit is False:
+            timings.cache_misses += 1
+
+
+class MetricsRegistry:
+    """Per view metrics of this process."""
+
+    def __init__(self):
+        self.views = {}
+        self._lock = threading.Lock()
+
+    def record(self, view, wall_time, timings):
+        metrics = self.views.get(view)
+        if metrics is None:
+            with self._lock:
+                metrics = self.views.setdefault(view, ViewMetrics())
+        metrics.record(wall_time, timings)
+
+    def snapshot(self):
+        return {view: metrics.snapshot() for view, metrics in list(self.views.items())}
+
+    def render(self):
+        """Renders the metrics in the Prometheus text format, timings in seconds."""
+        pid = os.getpid()
+        lines = []
+        for view, metrics in sorted(list(self.views.items())):
+            labels = f'view="{view}",pid="{pid}"'
+            for name in ('wall', 'db', 'cache'):
+                histogram = getattr(metrics, name)
+                metric = f'django_view_{name}_seconds'
+                for percent in PERCENTILES:
+                    lines.append(f'{metric}{{{labels},quantile="{percent / 100:g}"}} {histogram.percentile(percent) / 1e6:g}')
+                lines.append(f'{metric}_sum{{{labels}}} {histogram.total / 1e6:g}')
+                lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+            lines.append(f'django_view_queries_total{{{labels}}} {metrics.queries.total}')
+            lines.append(f'django_view_cache_hits_total{{{labels}}} {metrics.cache_hits}')
+            lines.append(f'django_view_cache_misses_total{{{labels}}} {metrics.cache_misses}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+class PostgresOnlyMixin:
+    """
+    Makes a migration operation a no-op on other databases, for Postgres specific indexes
+    and SQL. The migration state is updated on every database so models stay consistent.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class AddIndexIfPostgres(PostgresOnlyMixin, migrations.AddIndex):
+    pass
+
+
+class RunSQLIfPostgres(PostgresOnlyMixin, migrations.RunSQL):
+    pass
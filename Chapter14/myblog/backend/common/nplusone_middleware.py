@@ -0,0 +1,93 @@
+import os
+import re
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from common.logging_util import log_event
+
+_IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def query_shape(sql):
+    """Normalizes a SQL statement so queries differing only in their parameters group together."""
+    return _LITERALS.sub('?', _IN_LIST.sub('IN (...)', sql))
+
+
+def find_origin():
+    """Returns the innermost frame of project code which led to the current query."""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if filename.startswith(base_dir) and filename != __file__ and 'site-packages' not in filename:
+            return f'{os.path.relpath(filename, base_dir)}:{frame.lineno} in {frame.name}'
+    return None
+
+
+class NPlusOneQueryError(Exception):
+    pass
+
+
+class QueryCollector:
+    """`connection.execute_wrapper` hook counting the queries of one request by shape."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = query_shape(sql)
+        self.counts[shape] += 1
+        # Walking the stack is expensive, only do it once a shape becomes suspicious.
+        if self.counts[shape] == self.threshold:
+            self.origins[shape] = find_origin()
+        return execute(sql, params, many, context)
+
+    def suspects(self):
+        return [(shape, count, self.origins.get(shape)) for shape, count in self.counts.items() if count >= self.threshold]
+
+
+class NPlusOneQueryMiddleware:
+    """
+    Flags views which run the same query shape `THRESHOLD` times or more in a single request,
+    the usual symptom of a serializer touching a relation row by row.
+
+    Configured through the NPLUSONE_DETECTION setting, it is only enabled in DEBUG by default.
+    With `STRICT` the request fails with NPlusOneQueryError, the test runner turns it on.
+    Queries made while a StreamingHttpResponse is consumed are not seen.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, 'NPLUSONE_DETECTION', {})
+        if not config.get('ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = config.get('THRESHOLD', 5)
+        self.strict = config.get('STRICT', False)
+
+    def __call__(self, request):
+        collector = QueryCollector(self.threshold)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response = self.get_response(request)
+
+        suspects = collector.suspects()
+        if suspects:
+            view = request.resolver_match.view_name if request.resolver_match else request.path
+            for shape, count, origin in suspects:
+                log_event(
+                    'n_plus_one_query',
+                    {'view': view, 'count': count, 'origin': origin, 'sql': shape},
+                    level='WARNING',
+                )
+            if self.strict:
+                shape, count, origin = suspects[0]
+                raise NPlusOneQueryError(f'{view} ran {count} similar queries from {origin}: {shape}')
+        return response
@@ -0,0 +1,90 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.admin.views.main import ChangeList
+from django.core import paginator
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+def _estimate(queryset):
+    """Row estimate from the Postgres statistics, None when there is none."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where and not queryset.query.distinct:
+            # Unfiltered: the row count kept by VACUUM/ANALYZE, -1 if the table was never analyzed.
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+def estimated_count(queryset):
+    """
+    Counts a queryset, approximately when it is large: Postgres' own row estimate is used
+    once it reaches ESTIMATED_COUNT['THRESHOLD'], an exact COUNT(*) below that or when there
+    is no estimate. Results are cached for ESTIMATED_COUNT['TIMEOUT'] seconds.
+    """
+    config = settings.ESTIMATED_COUNT
+    try:
+        sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    except EmptyResultSet:
+        # e.g. .none() or pk__in=[], matches nothing without asking the database.
+        return 0
+    key = 'estimated-count:' + hashlib.md5(repr((queryset.db, sql, params)).encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = _estimate(queryset)
+        if count is None or count < config['THRESHOLD']:
+            count = queryset.count()
+        cache.set(key, count, config['TIMEOUT'])
+    return count
+
+
+class EstimatedCountPaginator(paginator.Paginator):
+    """Paginator whose count, and so the number of pages, comes from estimated_count."""
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            return estimated_count(self.object_list)
+        return super().count
+
+
+class _EstimatedTotal:
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def count(self):
+        return estimated_count(self.queryset)
+
+
+class EstimatedCountChangeList(ChangeList):
+    def get_results(self, request):
+        # With show_full_result_count the admin counts the whole table on top of the
+        # filtered results, estimate that total as well.
+        root_queryset = self.root_queryset
+        self.root_queryset = _EstimatedTotal(root_queryset)
+        try:
+            super().get_results(request)
+        finally:
+            self.root_queryset = root_queryset
+
+
+class EstimatedCountAdminMixin:
+    """ModelAdmin mixin estimating the result counts of the changelist, see estimated_count."""
+    paginator = EstimatedCountPaginator
+
+    def get_changelist(self, request, **kwargs):
+        return EstimatedCountChangeList
@@ -0,0 +1,96 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+
+from common.caching import bump_cache_version
+from common.caching import get_cache_version
+from common.caching import make_cache_key
+
+# Cache namespace of the permission snapshots, versioned per user id and for everyone
+# at once under ALL_USERS (group and permission changes affect many users).
+PERMISSIONS_CACHE = 'permissions'
+ALL_USERS = 'all'
+
+PermissionSnapshot = namedtuple('PermissionSnapshot', ['groups', 'user_permissions', 'group_permissions'])
+
+_EMPTY_SNAPSHOT = PermissionSnapshot(frozenset(), frozenset(), frozenset())
+
+
+def _permission_names(queryset):
+    return frozenset(f'{app_label}.{codename}' for app_label, codename in queryset.values_list(
+        'content_type__app_label', 'codename',
+    ))
+
+
+def _load_snapshot(user):
+    return PermissionSnapshot(
+        groups=frozenset(user.groups.values_list('name', flat=True)),
+        user_permissions=_permission_names(Permission.objects.filter(user=user)),
+        group_permissions=_permission_names(Permission.objects.filter(group__user=user)),
+    )
+
+
+def get_permission_snapshot(user):
+    """
+    Returns the group names and permissions ("app_label.codename") of a user.
+    Cached in Redis until the user's groups or permissions change, and on the user object
+    for the rest of the request.
+    """
+    snapshot = getattr(user, '_permission_snapshot', None)
+    if snapshot is not None:
+        return snapshot
+    if user.pk is None:
+        return _EMPTY_SNAPSHOT
+
+    version = f'{get_cache_version(PERMISSIONS_CACHE, user.pk)}-{get_cache_version(PERMISSIONS_CACHE, ALL_USERS)}'
+    key = make_cache_key(PERMISSIONS_CACHE, user.pk, version, (), {})
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = _load_snapshot(user)
+        cache.set(key, snapshot, settings.PERMISSIONS_CACHE_TIMEOUT)
+    user._permission_snapshot = snapshot
+    return snapshot
+
+
+def invalidate_permissions(user_ids):
+    for user_id in user_ids:
+        bump_cache_version(PERMISSIONS_CACHE, user_id)
+
+
+def invalidate_all_permissions():
+    bump_cache_version(PERMISSIONS_CACHE, ALL_USERS)
+
+
+def user_in_group(user, group_name):
+    return group_name in get_permission_snapshot(user).groups
+
+
+class CachedPermissionBackend(ModelBackend):
+    """ModelBackend reading permissions from the cached snapshot instead of running queries every request."""
+
+    def get_user_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if user_obj.is_superuser:
+            return super().get_user_permissions(user_obj, obj)
+        return set(get_permission_snapshot(user_obj).user_permissions)
+
+    def get_group_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if user_obj.is_superuser:
+            return super().get_group_permissions(user_obj, obj)
+        return set(get_permission_snapshot(user_obj).group_permissions)
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if user_obj.is_superuser:
+            return super().get_all_permissions(user_obj, obj)
+        if not hasattr(user_obj, '_perm_cache'):
+            snapshot = get_permission_snapshot(user_obj)
+            user_obj._perm_cache = snapshot.user_permissions | snapshot.group_permissions
+        return user_obj._perm_cache
@@ -0,0 +1,47 @@
+from cacheops.signals import cache_read
+from django.contrib.auth.models import Group
+from django.contrib.auth.models import Permission
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from common.metrics import record_cache_access
+from common.permissions import invalidate_all_permissions
+from common.permissions import invalidate_permissions
+
+
+@receiver(cache_read)
+def count_cacheops_read(sender, func, hit, **kwargs):
+    # cacheops does not report how long the read took, only count it.
+    record_cache_access(0, hit=hit)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_permissions(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Changed from the group or permission side, possibly for many users.
+        transaction.on_commit(invalidate_all_permissions)
+    else:
+        user_id = instance.pk
+        transaction.on_commit(lambda: invalidate_permissions([user_id]))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permissions(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate_all_permissions)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_on_group_change(sender, created=False, **kwargs):
+    # A new group has no members yet, renames and deletions change what users see.
+    if not created:
+        transaction.on_commit(invalidate_all_permissions)
@@ -0,0 +1,13 @@
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis_connection():
+    """
+    Returns the shared client for features which need Redis commands the Django cache API
+    does not expose (pub/sub, scripts, counters). The connection pool is fork safe.
+    """
+    return redis.Redis.from_url(settings.REDIS_CONNECTION_STRING)
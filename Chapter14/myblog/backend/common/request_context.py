@@ -0,0 +1,101 @@
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from contextvars import copy_context
+
+from asgiref.sync import iscoroutinefunction
+from asgiref.sync import markcoroutinefunction
+
+# Context variables follow the request into coroutines and sync_to_async/async_to_sync
+# calls, unlike thread locals which are shared by every coroutine running on a thread.
+_request = ContextVar('request', default=None)
+_txid = ContextVar('txid', default=None)
+
+_txid_counter = itertools.count(1)
+_txid_prefix = os.urandom(6).hex()
+
+
+def _reset_txid_prefix():
+    # A forked worker must not hand out the same ids as its parent.
+    global _txid_prefix, _txid_counter
+    _txid_prefix = os.urandom(6).hex()
+    _txid_counter = itertools.count(1)
+
+
+os.register_at_fork(after_in_child=_reset_txid_prefix)
+
+
+def new_txid():
+    """Returns a transaction id unique across processes, cheaper to build than a uuid4."""
+    return f'{_txid_prefix}-{next(_txid_counter):x}'
+
+
+def get_current_request():
+    """Returns the request being handled in the current context."""
+    return _request.get()
+
+
+def get_current_user():
+    """Returns the current user, if exist, otherwise returns None."""
+    request = _request.get()
+    if request:
+        return getattr(request, "user", None)
+
+
+def get_txid():
+    """Returns the current transaction id, if exist, otherwise returns None."""
+    return _txid.get()
+
+
+def get_current_user_id():
+    """Returns authenticated user's id for this request, if not present returns 0."""
+    user = get_current_user()
+    if user and user.id:
+        return user.id
+    return 0
+
+
+class RequestContextMiddleware:
+    """
+    Makes the request and a transaction id available anywhere while it is handled,
+    see get_current_request and get_txid. Works under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request_token = _request.set(request)
+        txid_token = _txid.set(new_txid())
+        try:
+            return self.get_response(request)
+        finally:
+            _txid.reset(txid_token)
+            _request.reset(request_token)
+
+    async def __acall__(self, request):
+        request_token = _request.set(request)
+        txid_token = _txid.set(new_txid())
+        try:
+            return await self.get_response(request)
+        finally:
+            _txid.reset(txid_token)
+            _request.reset(request_token)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor running each task in a copy of the submitter's context,
+    so code offloaded from a view still sees its request and txid.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(copy_context().run, fn, *args, **kwargs)
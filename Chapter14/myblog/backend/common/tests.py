@@ -0,0 +1,446 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import Group
+from django.contrib.auth.models import Permission
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test import TestCase
+from django.test import override_settings
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from common.admin_actions import BackgroundActionsAdminMixin
+from common.admin_actions import background_action
+from common.admin_actions import get_recent_jobs
+from common.admin_actions import start_background_action
+from common.caching import LocalCache
+from common.caching import single_flight_cached
+from common.custom_log_handlers import AsyncRotatingFileHandler
+from common.custom_runner import TemplateDatabase
+from common.metrics import Histogram
+from common.metrics import registry
+from common.nplusone_middleware import NPlusOneQueryError
+from common.nplusone_middleware import NPlusOneQueryMiddleware
+from common.nplusone_middleware import query_shape
+from common.paginator import EstimatedCountPaginator
+from common.permissions import user_in_group
+from common.redis_util import get_redis_connection
+from common.request_context import ContextThreadPoolExecutor
+from common.request_context import RequestContextMiddleware
+from common.request_context import get_current_request
+from common.request_context import get_txid
+from common.throttling import AnonRateThrottle
+from config.celery import app
+
+
+class NPlusOneQueryMiddlewareTests(TestCase):
+    def get_response(self, queries):
+        def view(request):
+            for user_id in range(queries):
+                User.objects.filter(id=user_id).exists()
+            return HttpResponse('ok')
+        return view
+
+    def test_query_shape(self):
+        self.assertEqual(
+            query_shape("SELECT 1 FROM t WHERE id IN (%s, %s, %s) AND name = 'x'"),
+            query_shape("SELECT 1 FROM t WHERE id IN (%s) AND name = 'y'"),
+        )
+
+    @override_settings(NPLUSONE_DETECTION={'ENABLED': True, 'THRESHOLD': 5, 'STRICT': True})
+    def test_strict_mode_fails_request(self):
+        middleware = NPlusOneQueryMiddleware(self.get_response(5))
+        with self.assertRaises(NPlusOneQueryError):
+            middleware(RequestFactory().get('/'))
+
+    @override_settings(NPLUSONE_DETECTION={'ENABLED': True, 'THRESHOLD': 5, 'STRICT': True})
+    def test_below_threshold(self):
+        middleware = NPlusOneQueryMiddleware(self.get_response(4))
+        self.assertEqual(middleware(RequestFactory().get('/')).status_code, 200)
+
+
+class LocalCacheTests(TestCase):
+    def test_lru_eviction(self):
+        local = LocalCache(max_size=2, ttl=60)
+        for key in ('a', 'b'):
+            local.set(key, key, scope='s', generation=local.generation())
+        local.get('a')
+        local.set('c', 'c', scope='s', generation=local.generation())
+        # `b` was the least recently used entry.
+        self.assertEqual(local.get('b', None), None)
+        self.assertEqual(local.get('a'), 'a')
+        self.assertEqual(local.get('c'), 'c')
+
+    def test_ttl(self):
+        local = LocalCache(max_size=10, ttl=30)
+        with mock.patch('common.caching.time.monotonic', return_value=100):
+            local.set('a', 1, scope='s', generation=local.generation())
+        with mock.patch('common.caching.time.monotonic', return_value=131):
+            self.assertEqual(local.get('a', None), None)
+
+    def test_evict_scope(self):
+        local = LocalCache(max_size=10, ttl=60)
+        local.set('a', 1, scope='author:1', generation=local.generation())
+        local.set('b', 2, scope='author:2', generation=local.generation())
+        generation = local.generation()
+        local.evict_scope('author:1')
+        self.assertEqual(local.get('a', None), None)
+        self.assertEqual(local.get('b'), 2)
+        # A value read before the eviction could be stale and is not stored.
+        local.set('a', 1, scope='author:1', generation=generation)
+        self.assertEqual(local.get('a', None), None)
+
+
+class SingleFlightCachedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+        @single_flight_cached(timeout=60)
+        def expensive(value):
+            self.calls += 1
+            time.sleep(0.2)
+            return value * 2
+
+        self.expensive = expensive
+
+    def test_concurrent_misses_compute_once(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.expensive(21))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [42] * 5)
+        self.assertEqual(self.calls, 1)
+
+    def test_waiters_take_over_when_the_computation_fails(self):
+        started, results = threading.Event(), []
+
+        @single_flight_cached(timeout=60)
+        def flaky():
+            self.calls += 1
+            if self.calls == 1:
+                started.set()
+                time.sleep(0.2)
+                raise TimeoutError
+            return 'value'
+
+        def first():
+            with self.assertRaises(TimeoutError):
+                flaky()
+
+        threads = [threading.Thread(target=first)]
+        threads[0].start()
+        started.wait()
+        threads += [threading.Thread(target=lambda: results.append(flaky())) for _ in range(4)]
+        begin = time.monotonic()
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 4)
+        self.assertEqual(self.calls, 2)
+        self.assertLess(time.monotonic() - begin, 2)
+
+    def test_early_refresh(self):
+        self.assertEqual(self.expensive(1), 2)
+        self.assertEqual(self.expensive(1), 2)
+        self.assertEqual(self.calls, 1)
+        # 0.1s before expiry a value taking 0.2s to compute is refreshed with this draw.
+        now = time.time()
+        with mock.patch('common.caching.time.time', return_value=now + 59.9), \
+                mock.patch('common.caching.random.random', return_value=0.5):
+            self.assertEqual(self.expensive(1), 2)
+        self.assertEqual(self.calls, 2)
+
+    def test_invalidate(self):
+        self.expensive(1)
+        self.expensive.invalidate(1)
+        self.expensive(1)
+        self.assertEqual(self.calls, 2)
+
+
+class AsyncRotatingFileHandlerTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'logs', 'test.log')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def record(self, data):
+        return logging.LogRecord('test', logging.INFO, __file__, 0, json.dumps(data), None, None)
+
+    def read_lines(self):
+        with open(self.filename) as f:
+            return f.read().splitlines()
+
+    def test_records_are_written_on_close(self):
+        handler = AsyncRotatingFileHandler(self.filename, flush_interval=60)
+        for i in range(3):
+            handler.handle(self.record({'ev': 'test', 'i': i}))
+        handler.close()
+        self.assertEqual(self.read_lines(), [f'{{"ev": "test", "i": {i}}}' for i in range(3)])
+
+    def test_records_are_dropped_when_the_queue_is_full(self):
+        handler = AsyncRotatingFileHandler(self.filename, queue_size=2)
+        # Keep the writer from draining the queue.
+        with mock.patch.object(handler, '_ensure_worker'):
+            for i in range(5):
+                handler.handle(self.record({'i': i}))
+        self.assertEqual(handler.dropped, 3)
+        handler._ensure_worker()
+        handler.close()
+        lines = self.read_lines()
+        self.assertEqual(lines[:2], ['{"i": 0}', '{"i": 1}'])
+        self.assertIn('"count": 3', lines[2])
+
+
+class RequestContextMiddlewareTests(TestCase):
+    def test_context_is_set_for_the_request_only(self):
+        seen = []
+
+        def view(request):
+            seen.append((get_current_request(), get_txid()))
+            return HttpResponse('ok')
+
+        middleware = RequestContextMiddleware(view)
+        first, second = RequestFactory().get('/'), RequestFactory().get('/')
+        middleware(first)
+        middleware(second)
+        self.assertEqual([request for request, _ in seen], [first, second])
+        self.assertNotEqual(seen[0][1], seen[1][1])
+        self.assertIsNone(get_current_request())
+        self.assertIsNone(get_txid())
+
+    def test_async_requests_and_thread_offloads_see_their_context(self):
+        async def view(request):
+            with ContextThreadPoolExecutor(max_workers=1) as executor:
+                return HttpResponse(executor.submit(get_current_request).result() is request)
+
+        middleware = RequestContextMiddleware(view)
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'True')
+        self.assertIsNone(get_current_request())
+
+
+class HistogramTests(TestCase):
+    def test_percentiles_are_within_the_bucket_precision(self):
+        histogram = Histogram()
+        for value in range(1, 100001):
+            histogram.record(value)
+        for percent in (50, 90, 99):
+            expected = 1000 * percent
+            self.assertLessEqual(abs(histogram.percentile(percent) - expected) / expected, 1 / 32)
+        self.assertEqual(histogram.percentile(100), 100000)
+        self.assertEqual(histogram.count, 100000)
+
+
+class CustomMiddlewareTests(TestCase):
+    def setUp(self):
+        registry.views.clear()
+
+    def test_view_metrics_are_recorded_and_exposed(self):
+        self.client.get('/blog/paginated/')
+        metrics = registry.views['blog.views.get_blog_with_pagination']
+        self.assertEqual(metrics.wall.count, 1)
+        self.assertGreater(metrics.queries.total, 0)
+        self.assertGreater(metrics.db.total, 0)
+
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('django_view_wall_seconds_count{view="blog.views.get_blog_with_pagination"', response.content.decode())
+        self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+
+class ThreePerMinuteThrottle(AnonRateThrottle):
+    rate = '3/min'
+
+
+class ThrottledView(APIView):
+    throttle_classes = [ThreePerMinuteThrottle]
+
+    def get(self, request):
+        return Response({'status': 'request was permitted'})
+
+
+class GCRAThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_burst_then_throttled(self):
+        view = ThrottledView.as_view()
+        statuses = [view(RequestFactory().get('/')).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 200])
+        response = view(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 429)
+        # The next request is allowed once one emission interval (20s) has passed.
+        self.assertTrue(0 < int(response['Retry-After']) <= 20)
+        # Other clients have their own limit.
+        self.assertEqual(view(RequestFactory().get('/', REMOTE_ADDR='10.0.0.2')).status_code, 200)
+
+
+class CachedPermissionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(name='editors')
+        self.user = User.objects.create_user('u1', 'u1@abc.co')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.group)
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_checks_are_cached_until_permissions_change(self):
+        user = self.fresh_user()
+        self.assertTrue(user_in_group(user, 'editors'))
+        self.assertFalse(user.has_perm('blog.update_title'))
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user_in_group(user, 'editors'))
+            self.assertFalse(user.has_perm('blog.update_title'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.add(Permission.objects.get(codename='update_title'))
+        self.assertTrue(self.fresh_user().has_perm('blog.update_title'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.group)
+        user = self.fresh_user()
+        self.assertFalse(user_in_group(user, 'editors'))
+        self.assertFalse(user.has_perm('blog.update_title'))
+
+    def test_sessions_of_the_model_backend_stay_logged_in(self):
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        resp = self.client.get('/admin/')
+        self.assertEqual(resp.wsgi_request.user, self.user)
+
+
+@override_settings(ESTIMATED_COUNT={'THRESHOLD': 100, 'TIMEOUT': 60})
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.bulk_create(User(username=f'u{i}') for i in range(5))
+
+    def test_exact_count_below_threshold(self):
+        queryset = User.objects.filter(username__startswith='u').order_by('id')
+        self.assertEqual(EstimatedCountPaginator(queryset, 2).count, 5)
+        # Cached for the next request.
+        with self.assertNumQueries(0):
+            self.assertEqual(EstimatedCountPaginator(queryset, 2).count, 5)
+
+    def test_estimate_above_threshold(self):
+        with mock.patch('common.paginator._estimate', return_value=250000):
+            paginator = EstimatedCountPaginator(User.objects.order_by('id'), 100)
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.num_pages, 2500)
+
+    def test_empty_by_construction(self):
+        for queryset in (User.objects.none(), User.objects.filter(pk__in=[])):
+            with self.assertNumQueries(0):
+                self.assertEqual(EstimatedCountPaginator(queryset.order_by('id'), 2).count, 0)
+
+
+class UserChunksAdmin(BackgroundActionsAdminMixin, admin.ModelAdmin):
+    chunks = []
+    search_fields = ['username']
+
+    @background_action(description='Collect usernames', chunk_size=2)
+    def collect_usernames(self, queryset):
+        self.chunks.append(list(queryset.values_list('username', flat=True)))
+
+
+@background_action(description='Collect emails', chunk_size=10)
+def collect_emails(modeladmin, queryset):
+    modeladmin.chunks.append(list(queryset.values_list('email', flat=True)))
+
+
+class UserEmailsAdmin(admin.ModelAdmin):
+    chunks = []
+    search_fields = ['email']
+    actions = [collect_emails]
+
+
+class BackgroundActionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        UserChunksAdmin.chunks.clear()
+        app.conf.task_always_eager = True
+        self.addCleanup(setattr, app.conf, 'task_always_eager', False)
+        User.objects.bulk_create(User(username=f'u{i}') for i in range(5))
+        self.modeladmin = UserChunksAdmin(User, admin.site)
+
+    def test_action_runs_in_chunks_after_the_request(self):
+        request = RequestFactory().post('/')
+        request.user = User.objects.create_superuser('admin', 'admin@abc.co', 'password')
+        queryset = User.objects.filter(username__startswith='u').order_by('-username')
+        with mock.patch.object(self.modeladmin, 'message_user'), self.captureOnCommitCallbacks() as callbacks:
+            self.modeladmin.collect_usernames(request, queryset)
+        # Nothing ran during the request.
+        self.assertEqual(UserChunksAdmin.chunks, [])
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(UserChunksAdmin.chunks, [['u0', 'u1'], ['u2', 'u3'], ['u4']])
+        job, = get_recent_jobs(User)
+        self.assertEqual((job['status'], job['processed'], job['total']), ('done', 5, 5))
+        self.assertEqual(len(job['selection']['pks']), 5)
+
+    def test_select_all_reapplies_the_changelist_filters(self):
+        request = RequestFactory().post('/?q=u', {'select_across': '1', 'action': 'collect_usernames'})
+        request.user = User.objects.create_superuser('admin', 'admin@abc.co', 'password')
+        with mock.patch.object(self.modeladmin, 'message_user'), self.captureOnCommitCallbacks(execute=True):
+            self.modeladmin.collect_usernames(request, User.objects.all())
+
+        self.assertEqual(UserChunksAdmin.chunks, [['u0', 'u1'], ['u2', 'u3'], ['u4']])
+        job, = get_recent_jobs(User)
+        self.assertEqual(job['selection'], {'filters': [['q', ['u']]]})
+
+    def test_select_all_with_a_function_on_an_unregistered_admin(self):
+        UserEmailsAdmin.chunks.clear()
+        User.objects.filter(username__in=['u1', 'u2']).update(email='found@abc.co')
+        request = RequestFactory().post('/?q=found', {'select_across': '1', 'action': 'collect_emails'})
+        request.user = User.objects.create_superuser('admin', 'admin@abc.co', 'password')
+        modeladmin = UserEmailsAdmin(User, admin.site)
+        with mock.patch.dict(admin.site._registry, clear=True), mock.patch.object(modeladmin, 'message_user'), \
+                self.captureOnCommitCallbacks(execute=True):
+            collect_emails(modeladmin, request, User.objects.all())
+        self.assertEqual(UserEmailsAdmin.chunks, [['found@abc.co', 'found@abc.co']])
+
+    def test_select_all_without_a_modeladmin_fails(self):
+        with mock.patch.dict(admin.site._registry, clear=True), self.captureOnCommitCallbacks(execute=True):
+            start_background_action(
+                'common.tests:collect_emails', User, {'filters': []}, 10, 'Collect emails', User.objects.first().pk,
+            )
+        job, = get_recent_jobs(User)
+        self.assertEqual(job['status'], 'failed')
+
+
+class TemplateDatabaseTests(TestCase):
+    def test_test_database_comes_from_a_current_template(self):
+        template = TemplateDatabase(connection)
+        if not template.supported:
+            self.skipTest(f'No template databases for {connection.vendor} in memory databases')
+        # Built (or reused) while the test databases were set up, outside the source tree.
+        self.assertIn(template.name, template._list())
+        self.assertFalse(os.path.abspath(template.name).startswith(str(settings.BASE_DIR)))
+
+
+class RedisTestDatabaseTests(TestCase):
+    def test_tests_flush_their_own_redis_database(self):
+        self.assertEqual(get_redis_connection().connection_pool.connection_kwargs['db'], settings.REDIS_TEST_DB)
+        self.assertTrue(cache._cache._servers[0].endswith(f'/{settings.REDIS_TEST_DB}'))
@@ -0,0 +1,76 @@
+import math
+from functools import lru_cache
+
+import redis
+from rest_framework import throttling
+
+from common.redis_util import get_redis_connection
+
+# GCRA (generic cell rate algorithm): a single timestamp per key, the theoretical arrival time
+# (TAT) of the next request, replaces DRF's cached list of request timestamps. Every request
+# moves it one emission interval (duration / num_requests) forward, a request is allowed while
+# the TAT stays within `duration` of now, so `num_requests` may still arrive as a burst.
+# The clock is Redis' own, workers with skewed clocks agree on it.
+_GCRA_SCRIPT = '''
+local emission_interval = tonumber(ARGV[1])
+local duration = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+local new_tat = math.max(tat, now) + emission_interval
+if new_tat - now > duration then
+    return {0, new_tat - now - duration}
+end
+redis.call('SET', KEYS[1], string.format('%d', new_tat), 'PX', new_tat - now)
+return {1, 0}
+'''
+
+
+@lru_cache(maxsize=None)
+def _gcra_script():
+    return get_redis_connection().register_script(_GCRA_SCRIPT)
+
+
+class GCRAThrottleMixin:
+    """
+    Makes a DRF SimpleRateThrottle check and update its limit with one atomic Redis script,
+    constant work and storage per request whatever the rate. Rates and scopes are read as usual,
+    from `rate` or DEFAULT_THROTTLE_RATES. Requests are let through if Redis is unavailable.
+    """
+    cache_format = 'throttle:gcra:%(scope)s:%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        duration = self.duration * 1000
+        try:
+            allowed, wait = _gcra_script()(keys=[self.key], args=[math.ceil(duration / self.num_requests), duration])
+        except redis.RedisError:
+            return True
+        self.wait_seconds = wait / 1000
+        return True if allowed else self.throttle_failure()
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class AnonRateThrottle(GCRAThrottleMixin, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(GCRAThrottleMixin, throttling.UserRateThrottle):
+    pass
+
+
+class ScopedRateThrottle(GCRAThrottleMixin, throttling.ScopedRateThrottle):
+    def allow_request(self, request, view):
+        # Resolves the rate from the view's scope like DRF, then applies GCRA.
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.http import HttpResponseForbidden
+
+from common.metrics import registry
+
+
+def metrics_view(request):
+    """Per view metrics of the worker process serving the request, in the Prometheus text format."""
+    if request.META.get('REMOTE_ADDR') not in settings.VIEW_METRICS['ALLOWED_IPS']:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4')
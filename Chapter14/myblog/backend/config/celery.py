@@ -1,5 +1,7 @@
+import logging
 import os
 from celery import Celery
+from celery.signals import worker_process_shutdown
 
 celery_settings_value = "config.settings"
 # change <project name> with folder name where your settings.py file is present.
@@ -15,6 +17,11 @@ app.autodiscover_tasks()
 task = app.task
 
 
+# Pool processes exit without running atexit hooks, flush the buffered log records first.
+@worker_process_shutdown.connect
+def flush_logs(**kwargs):
+    logging.shutdown()
+
 
 @app.task(bind=True)
 def debug_task(self, data):
@@ -38,6 +38,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 CUSTOM_APPS = [
@@ -64,6 +65,8 @@ THIRD_PARTY_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + CUSTOM_APPS
 
 MIDDLEWARE = [
+    # First, so everything below can log with the request's txid.
+    'common.request_context.RequestContextMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,10 +74,41 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    # 'common.localthread_middleware.PopulateLocalsThreadMiddleware',
+    'common.nplusone_middleware.NPlusOneQueryMiddleware',
     'common.custom_middleware.CustomMiddleware',
 ]
 
+# Logs views running the same query shape THRESHOLD times or more in one request.
+# STRICT fails the request instead, the test runner enables it for the test suite.
+NPLUSONE_DETECTION = {
+    'ENABLED': DEBUG,
+    'THRESHOLD': 5,
+    'STRICT': False,
+}
+
+# ModelBackend with the permission checks served from a cache, see common.permissions.
+# ModelBackend stays listed for the sessions it logged in, Django logs out any session whose
+# backend is missing here. Its permission checks read the permissions the first backend
+# cached on the user and run no queries. Drop it once those sessions have expired.
+AUTHENTICATION_BACKENDS = [
+    'common.permissions.CachedPermissionBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+PERMISSIONS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Querysets with at least THRESHOLD estimated rows are not counted exactly, see common.paginator.
+ESTIMATED_COUNT = {
+    'THRESHOLD': 100000,
+    'TIMEOUT': 60,  # seconds
+}
+
+# Per view latency, database and cache histograms recorded by CustomMiddleware.
+# /metrics/ only answers requests coming from ALLOWED_IPS.
+VIEW_METRICS = {
+    'ENABLED': True,
+    'ALLOWED_IPS': ['127.0.0.1'],
+}
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -174,12 +208,16 @@ REST_FRAMEWORK = {
         'anon': '100/day',
         'user': '1000/day',
         'scope': '10000/day',
+        'blog_limit': '100/hour',
+        'blog_2_limit': '10/minute',
     }
 
 }
 
 REDIS_HOST = os.environ.get('REDIS_HOST')
 REDIS_PORT = os.environ.get('REDIS_PORT')
+# Redis database used while running the tests, which flush it, see common.custom_runner.
+REDIS_TEST_DB = int(os.environ.get('REDIS_TEST_DB', 15))
 
 # Add the following lines to enable Redis caching
 CACHES = {
@@ -190,6 +228,19 @@ CACHES = {
     }
 }
 
+# Cached blog lists are invalidated when the author's blogs change, the timeout only
+# bounds how long unused entries are kept.
+BLOGS_BY_AUTHOR_CACHE_TIMEOUT = 60 * 60 * 6
+
+# In-process cache kept in front of Redis for hot reads, see common.caching.LocalCache.
+# Invalidations reach the other workers over the CHANNEL pub/sub channel, TTL (seconds)
+# bounds how long an entry can be served if a message is ever missed.
+LOCAL_CACHE = {
+    'MAX_SIZE': 1024,
+    'TTL': 30,
+    'CHANNEL': 'cache-invalidation',
+}
+
 # Add the following lines to enable Cacheops with Redis in Django
 CACHEOPS_REDIS = {
     "host": REDIS_HOST,  # Redis endpoint
@@ -212,11 +263,15 @@ LOGGING = {
     },
     "handlers": {
         "django_file": {
-            "class": "common.custom_log_handlers.MakeRotatingFileHandler",
+            # Formats and writes records on a background thread, see AsyncRotatingFileHandler.
+            "class": "common.custom_log_handlers.AsyncRotatingFileHandler",
             "filename": os.path.join(BASE_DIR, "logs/django_logs.log"),
             "maxBytes": 1024 * 1024 * 10,  # 10MB
             "backupCount": 10,
-            "formatter": "verbose"
+            "formatter": "verbose",
+            "queue_size": 10000,  # records beyond this are dropped and counted
+            "batch_size": 500,
+            "flush_interval": 1.0,  # seconds
         },
     },
 }
@@ -228,4 +283,7 @@ REDIS_CONNECTION_STRING = f'redis://{REDIS_HOST}:{REDIS_PORT}'
 CELERY_BROKER_URL = f"{REDIS_CONNECTION_STRING}"
 CELERY_RESULT_BACKEND = f"{REDIS_CONNECTION_STRING}"
 
+# Followers emailed by each batch task when a blog is published, see blog.tasks.
+FOLLOWER_EMAIL_BATCH_SIZE = 1000
+
 TEST_RUNNER = 'common.custom_runner.CustomRunner'
@@ -18,6 +18,10 @@ from django.urls import path
 from django.urls import include
 
 from django.http import HttpResponse
+
+from common.views import metrics_view
+
+
 def rollbar_test_view(request):
     a = None
     a.hello() # This would raise an exception
@@ -29,6 +33,7 @@ urlpatterns = [
     path('api/auth/v1/', include('custom_user.urls')),
     path('ht/', include('health_check.urls')),
     path('rollbar-test/', rollbar_test_view),
+    path('metrics/', metrics_view),
 ]
 
 